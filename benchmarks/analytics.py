@@ -0,0 +1,71 @@
+"""
+GET /analytics work for one user with a large history: looping over every
+expense row in python against the columnar rollup fetch plus numpy that the
+route uses.
+
+Seeds a throwaway user with --expenses rows (same data as rollup_summaries),
+times both paths and deletes the user again.
+
+usage: python -m benchmarks.analytics --expenses 1000000 --repeat 5
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import date
+from database.connection import get_db_connection
+from benchmarks.seed import bench_user
+from routes.analytics import ANALYTICS_SQL
+from utils.analytics import history_start,spending_analytics
+
+def row_loop(conn,user_id,start):
+    #the straightforward version: one dict per expense, summed in python
+    rows=conn.execute("SELECT date,category,amount FROM expenses WHERE user_id=%s AND date>=%s",(user_id,start)).fetchall()
+    monthly=defaultdict(float)
+    by_category=defaultdict(float)
+    for row in rows:
+        monthly[row['date'].strftime("%Y-%m")]+=float(row['amount'])
+        by_category[row['category']]+=float(row['amount'])
+    return monthly,by_category
+
+def columnar(conn,user_id,start,today,months,window):
+    row=conn.execute(ANALYTICS_SQL,(user_id,start)).fetchone()
+    fetched=time.perf_counter()
+    spending_analytics(row['days'],row['categories'],row['totals'],today,months,window)
+    return fetched
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses",type=int,default=1000000)
+    parser.add_argument("--days",type=int,default=1095)
+    parser.add_argument("--months",type=int,default=36)
+    parser.add_argument("--window",type=int,default=3)
+    parser.add_argument("--repeat",type=int,default=5)
+    args=parser.parse_args()
+
+    today=date.today()
+    start=history_start(today,args.months,args.window)
+    with get_db_connection() as conn:
+        user_id=bench_user(conn,args.expenses,args.days)
+        try:
+            print(f"{args.expenses} expenses over {args.days} days, {args.months} months of analytics")
+            started=time.perf_counter()
+            for _ in range(args.repeat):
+                row_loop(conn,user_id,start)
+            loop_ms=(time.perf_counter()-started)/args.repeat*1000
+
+            fetch_ms=compute_ms=0.0
+            for _ in range(args.repeat):
+                started=time.perf_counter()
+                fetched=columnar(conn,user_id,start,today,args.months,args.window)
+                done=time.perf_counter()
+                fetch_ms+=(fetched-started)*1000/args.repeat
+                compute_ms+=(done-fetched)*1000/args.repeat
+            print(f"  row loop over expenses: {loop_ms:9.1f} ms")
+            print(f"  rollup arrays + numpy:  {fetch_ms+compute_ms:9.1f} ms  (fetch {fetch_ms:.1f} ms, numpy {compute_ms:.1f} ms)")
+            print(f"  {loop_ms/(fetch_ms+compute_ms):.0f}x faster")
+        finally:
+            conn.execute("DELETE FROM users WHERE id=%s",(user_id,))
+            conn.commit()
+
+if __name__=="__main__":
+    main()
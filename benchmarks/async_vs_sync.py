@@ -0,0 +1,81 @@
+"""
+Throughput of the sync request path against the async one, at the database layer.
+
+sync:  blocking psycopg connections from a ConnectionPool, driven by a 40 thread
+       executor (the anyio limiter FastAPI uses for plain def handlers)
+async: the app's AsyncConnectionPool driven by asyncio tasks (async def handlers)
+
+Both sides run the GET /expenses query with the same pool size, so the difference
+is what each execution model can keep in flight.
+
+usage: python -m benchmarks.async_vs_sync --requests 5000 --concurrency 1000 --latency-ms 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+import config
+from database import connection
+
+QUERY="SELECT * FROM expenses WHERE user_id=%s ORDER BY date DESC LIMIT 50"
+SLEEP="SELECT pg_sleep(%s)"
+THREADPOOL_SIZE=40
+
+def _report(name,latencies,elapsed):
+    latencies.sort()
+    print(f"{name:>5}: {len(latencies)/elapsed:8.0f} req/s  "
+          f"p50 {statistics.median(latencies)*1000:7.2f} ms  "
+          f"p99 {latencies[int(len(latencies)*0.99)-1]*1000:7.2f} ms")
+
+def run_sync(args):
+    pool=ConnectionPool(connection._conninfo(),min_size=args.pool,max_size=args.pool,kwargs={"row_factory":dict_row},open=True)
+    pool.wait()
+
+    def one_request(user_id):
+        started=time.perf_counter()
+        with pool.connection() as conn:
+            if args.latency_ms:
+                conn.execute(SLEEP,(args.latency_ms/1000,))
+            conn.execute(QUERY,(user_id,)).fetchall()
+        return time.perf_counter()-started
+
+    started=time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as executor:
+        latencies=list(executor.map(one_request,[args.user_id]*args.requests))
+    _report("sync",latencies,time.perf_counter()-started)
+    pool.close()
+
+async def run_async(args):
+    pool=await connection.open_pool(min_size=args.pool,max_size=args.pool)
+    limit=asyncio.Semaphore(args.concurrency)
+
+    async def one_request(user_id):
+        async with limit:
+            started=time.perf_counter()
+            async with pool.connection() as conn:
+                if args.latency_ms:
+                    await conn.execute(SLEEP,(args.latency_ms/1000,))
+                await (await conn.execute(QUERY,(user_id,))).fetchall()
+            return time.perf_counter()-started
+
+    started=time.perf_counter()
+    latencies=await asyncio.gather(*(one_request(args.user_id) for _ in range(args.requests)))
+    _report("async",list(latencies),time.perf_counter()-started)
+    await connection.close_pool()
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests",type=int,default=2000)
+    parser.add_argument("--concurrency",type=int,default=1000,help="in-flight requests on the async side")
+    parser.add_argument("--pool",type=int,default=config.DB_POOL_MAX_SIZE,help="connections on both sides")
+    parser.add_argument("--latency-ms",type=float,default=0,help="extra server-side wait per request (pg_sleep)")
+    parser.add_argument("--user-id",type=int,default=1)
+    args=parser.parse_args()
+    run_sync(args)
+    asyncio.run(run_async(args))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Rows per second of POST /expenses (one INSERT and commit per row) against
+POST /expenses/bulk (one array INSERT and one commit per batch).
+
+Runs against the database configured in .env, inside a throwaway user that is
+deleted afterwards.
+
+usage: python -m benchmarks.bulk_insert --rows 5000 --batch 1000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from database import connection
+from routes.expenses import insert_expenses_bulk
+from schemas.expense import ExpenseCreate
+
+SINGLE_INSERT_SQL="INSERT INTO expenses(description,amount,category,date,user_id) VALUES(%s,%s,%s,%s,%s) RETURNING id,date,category,amount"
+
+def _expenses(n):
+    return [ExpenseCreate(description=f"bench {i}",amount=(i%500)+1.25,category="bench",date=f"{(i%28)+1:02d}-01-2024") for i in range(n)]
+
+async def run(args):
+    pool=await connection.open_pool(min_size=1,max_size=1)
+    async with pool.connection() as conn:
+        cur=await conn.execute(
+            "INSERT INTO users(name,email,hashed_password) VALUES (%s,%s,%s) RETURNING id",
+            ("bench",f"bench-{uuid.uuid4().hex}@example.com","x")
+        )
+        user_id=(await cur.fetchone())['id']
+        await conn.commit()
+        expenses=_expenses(args.rows)
+        try:
+            started=time.perf_counter()
+            for e in expenses:
+                await conn.execute(SINGLE_INSERT_SQL,(e.description,e.amount,e.category,e.date,user_id))
+                await conn.commit()
+            single=time.perf_counter()-started
+
+            started=time.perf_counter()
+            for i in range(0,len(expenses),args.batch):
+                await insert_expenses_bulk(conn,user_id,expenses[i:i+args.batch])
+                await conn.commit()
+            bulk=time.perf_counter()-started
+        finally:
+            await conn.execute("DELETE FROM users WHERE id=%s",(user_id,))
+            await conn.commit()
+    await connection.close_pool()
+
+    print(f"single: {args.rows/single:10.0f} rows/s")
+    print(f"  bulk: {args.rows/bulk:10.0f} rows/s  (batch {args.batch}, {single/bulk:.1f}x)")
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows",type=int,default=5000)
+    parser.add_argument("--batch",type=int,default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__=="__main__":
+    main()
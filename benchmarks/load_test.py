@@ -0,0 +1,274 @@
+"""
+Load test for every router in main2.py: p50/p95/p99 latency, throughput and
+database queries per request, for users with 1k, 100k and 1M expenses.
+
+Seeds the users first (benchmarks/seed.py, skipped when they already exist),
+then runs each scenario in turn with --concurrency clients until --requests
+requests have completed. By default the app runs in this process through
+httpx's ASGI transport, which also lets it count queries, with rate limiting
+off unless RATE_LIMIT_ENABLED is set. --url points the clients at a running
+server instead (queries per request is then null, raise its rate limits).
+
+The results can be saved as a JSON baseline and compared with a later run:
+
+usage: python -m benchmarks.load_test --sizes 1000,100000,1000000 --output baseline.json
+       python -m benchmarks.load_test --sizes 1000,100000 --compare baseline.json
+       python -m benchmarks.load_test --only "GET /expenses" --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import nullcontext
+from datetime import date,datetime,timedelta,timezone
+import httpx
+#one user per size sends every request, so the in-process app runs without per-user rate limits
+os.environ.setdefault("RATE_LIMIT_ENABLED","false")
+from benchmarks.seed import LOAD_PASSWORD,email_for,seed
+from database.connection import get_db_connection
+from database.rollup import rebuild
+from utils.metrics import QUERY_DURATION
+from utils.pagination import encode_cursor
+
+WRITE_DESCRIPTION="load test write" #rows the write scenarios create, deleted after each user
+
+#each scenario sends one request. ctx holds what setup found out about the user,
+#state is private to one client (refresh tokens rotate on every use)
+async def login(client,ctx,state):
+    return await client.post("/auth/login",json={"email":ctx['email'],"password":LOAD_PASSWORD})
+
+async def refresh(client,ctx,state):
+    if "refresh_token" not in state:
+        state['refresh_token']=ctx['refresh_tokens'].pop()
+    response=await client.post("/auth/refresh",json={"refresh_token":state['refresh_token']})
+    state['refresh_token']=response.json().get('refresh_token')
+    return response
+
+def get(path,params=None):
+    async def scenario(client,ctx,state):
+        return await client.get(path,params=params(ctx) if callable(params) else params,headers=ctx['headers'])
+    return scenario
+
+async def revalidate(client,ctx,state):
+    #a polling client that already has the page: answered 304 from the data version alone
+    if "etag" not in state:
+        state['etag']=(await client.get("/expenses/",headers=ctx['headers'])).headers['etag']
+    return await client.get("/expenses/",headers={**ctx['headers'],"If-None-Match":state['etag']})
+
+async def create_expense(client,ctx,state):
+    response=await client.post("/expenses/",headers=ctx['headers'],json={
+        "description":WRITE_DESCRIPTION,"amount":12.5,"category":"cat1","date":date.today().isoformat()
+    })
+    ctx['created'].append(response.json()['id'])
+    return response
+
+async def update_expense(client,ctx,state):
+    ctx['turn']+=1
+    expense_id=ctx['created'][ctx['turn']%len(ctx['created'])]
+    return await client.put(f"/expenses/{expense_id}",headers=ctx['headers'],json={"amount":13.75})
+
+async def delete_expense(client,ctx,state):
+    if not ctx['created']:
+        await create_expense(client,ctx,state)
+    return await client.delete(f"/expenses/{ctx['created'].pop()}",headers=ctx['headers'])
+
+async def bulk_insert(client,ctx,state):
+    items=[{"description":WRITE_DESCRIPTION,"amount":i+1,"category":"cat2","date":date.today().isoformat()} for i in range(100)]
+    return await client.post("/expenses/bulk",headers=ctx['headers'],json=items)
+
+async def update_budget(client,ctx,state):
+    ctx['turn']+=1
+    budget_id=ctx['budgets'][ctx['turn']%len(ctx['budgets'])]
+    return await client.put(f"/budgets/{budget_id}",headers=ctx['headers'],json={"monthly_limit":5000})
+
+async def export(client,ctx,state):
+    since=(date.today()-timedelta(days=30)).isoformat()
+    async with client.stream("GET","/expenses/export",params={"format":"ndjson","from":since},headers=ctx['headers']) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+def deep_cursor(ctx):
+    #half way through a three year history
+    return {"cursor":encode_cursor(date.today()-timedelta(days=550),2**31-1)}
+
+def filters(ctx):
+    return [("from",(date.today()-timedelta(days=90)).isoformat()),("category","cat1"),("category","cat2"),("min_amount","100")]
+
+#in run order: writes that need ids come after the writes that create them
+SCENARIOS={
+    "GET /health":get("/health"),
+    "POST /auth/login":login,
+    "POST /auth/refresh":refresh,
+    "GET /auth/me":get("/auth/me"),
+    "GET /expenses":get("/expenses/"),
+    "GET /expenses 304":revalidate,
+    "GET /expenses deep page":get("/expenses/",deep_cursor),
+    "GET /expenses filtered":get("/expenses/",filters),
+    "GET /expenses/search":get("/expenses/search",{"q":"seeded expense"}), #every seeded row matches
+    "GET /expenses/total":get("/expenses/total"),
+    "GET /expenses/summary/today":get("/expenses/summary/today"),
+    "GET /expenses/summary/weekly":get("/expenses/summary/weekly"),
+    "GET /expenses/summary/monthly":get("/expenses/summary/monthly"),
+    "GET /expenses/export 30 days":export,
+    "POST /expenses":create_expense,
+    "PUT /expenses/{id}":update_expense,
+    "DELETE /expenses/{id}":delete_expense,
+    "POST /expenses/bulk 100":bulk_insert,
+    "GET /budgets":get("/budgets/"),
+    "GET /budgets/total":get("/budgets/total"),
+    "GET /budgets/status":get("/budgets/status"),
+    "PUT /budgets/{id}":update_budget,
+    "GET /dashboard":get("/dashboard/"),
+    "GET /analytics":get("/analytics/"),
+}
+#bcrypt makes login/refresh cost ~100x a read, they get fewer requests
+SLOW_SCENARIOS={"POST /auth/login","POST /auth/refresh"}
+
+
+def percentile(sorted_values,q):
+    return sorted_values[min(len(sorted_values)-1,int(q*len(sorted_values)))]
+
+async def run_scenario(client,scenario,ctx,requests,concurrency,count_queries):
+    latencies=[]
+    errors=0
+    remaining=iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        state={}
+        for _ in remaining:
+            started=time.perf_counter()
+            response=await scenario(client,ctx,state)
+            latencies.append(time.perf_counter()-started)
+            if response.status_code>=400:
+                errors+=1
+
+    queries=QUERY_DURATION.total_count() #every statement the in-process app runs is timed there
+    started=time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency,requests))))
+    elapsed=time.perf_counter()-started
+    latencies.sort()
+    return{
+        "requests":len(latencies),
+        "errors":errors,
+        "throughput_rps":round(len(latencies)/elapsed,1),
+        "p50_ms":round(percentile(latencies,0.50)*1000,3),
+        "p95_ms":round(percentile(latencies,0.95)*1000,3),
+        "p99_ms":round(percentile(latencies,0.99)*1000,3),
+        "mean_ms":round(statistics.fmean(latencies)*1000,3),
+        "queries_per_request":round((QUERY_DURATION.total_count()-queries)/len(latencies),2) if count_queries else None
+    }
+
+async def setup_user(client,size,clients):
+    #logging in one at a time: a burst of logins would be turned away by the hashing queue (503)
+    tokens=[]
+    for _ in range(clients):
+        response=await client.post("/auth/login",json={"email":email_for(size),"password":LOAD_PASSWORD})
+        response.raise_for_status()
+        tokens.append(response.json())
+    headers={"Authorization":f"Bearer {tokens[0]['access_token']}"}
+    budgets=(await client.get("/budgets/",headers=headers)).json()['items']
+    return{
+        "email":email_for(size),
+        "headers":headers,
+        "refresh_tokens":[token['refresh_token'] for token in tokens], #one rotating chain per client
+        "budgets":[b['id'] for b in budgets],
+        "created":[],
+        "turn":0
+    }
+
+def cleanup(user_id):
+    #removing what the write scenarios added so the user keeps its seeded size
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM expenses WHERE user_id=%s AND description=%s",(user_id,WRITE_DESCRIPTION))
+        conn.commit()
+        rebuild(conn,user_id)
+
+def metadata(args):
+    try:
+        commit=subprocess.run(["git","rev-parse","--short","HEAD"],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        commit=None
+    with get_db_connection() as conn:
+        server=conn.execute("SHOW server_version").fetchone()['server_version']
+    return{
+        "started_at":datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit":commit,
+        "python":platform.python_version(),
+        "postgres":server,
+        "target":args.url or "in-process",
+        "requests":args.requests,
+        "slow_requests":args.slow_requests,
+        "concurrency":args.concurrency
+    }
+
+async def run(args):
+    sizes=[int(size) for size in args.sizes.split(",")]
+    users=seed(sizes)
+    names=[name for name in SCENARIOS if not args.only or name in args.only]
+    results={"meta":metadata(args),"results":{}}
+
+    if args.url:
+        client=httpx.AsyncClient(base_url=args.url,timeout=120)
+        app_context=nullcontext()
+    else:
+        from main2 import app
+        client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app),base_url="http://load-test",timeout=120)
+        app_context=app.router.lifespan_context(app)
+
+    async with app_context,client:
+        for size in sizes:
+            ctx=await setup_user(client,size,args.concurrency)
+            results["results"][str(size)]={}
+            print(f"\n{size} expenses")
+            try:
+                for name in names:
+                    requests=args.slow_requests if name in SLOW_SCENARIOS else args.requests
+                    stats=await run_scenario(client,SCENARIOS[name],ctx,requests,args.concurrency,not args.url)
+                    results["results"][str(size)][name]=stats
+                    queries="" if stats['queries_per_request'] is None else f"  {stats['queries_per_request']:5.2f} q/req"
+                    print(f"  {name:<32} {stats['throughput_rps']:8.1f} req/s  p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  p99 {stats['p99_ms']:8.2f} ms{queries}"
+                          +(f"  {stats['errors']} errors" if stats['errors'] else ""))
+            finally:
+                cleanup(users[size])
+    return results
+
+def compare(current,baseline):
+    #printing the change of every scenario both runs have, negative latency change is faster
+    print(f"\ncompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')})")
+    for size,scenarios in current["results"].items():
+        for name,stats in scenarios.items():
+            before=baseline["results"].get(size,{}).get(name)
+            if not before:
+                continue
+            change=lambda key:(stats[key]-before[key])/before[key]*100 if before[key] else 0.0
+            print(f"  {size:>8} {name:<32} p50 {change('p50_ms'):+7.1f}%  p95 {change('p95_ms'):+7.1f}%  p99 {change('p99_ms'):+7.1f}%  throughput {change('throughput_rps'):+7.1f}%")
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes",default="1000,100000,1000000",help="comma separated expense counts, one user each")
+    parser.add_argument("--requests",type=int,default=500,help="requests per scenario")
+    parser.add_argument("--slow-requests",type=int,default=50,help="requests for login and refresh")
+    parser.add_argument("--concurrency",type=int,default=20)
+    parser.add_argument("--url",help="run against this server instead of in-process, e.g. http://localhost:8000")
+    parser.add_argument("--only",action="append",help="scenario name, can be repeated")
+    parser.add_argument("--output",help="write the results to this JSON file")
+    parser.add_argument("--compare",help="baseline JSON file from an earlier run")
+    args=parser.parse_args()
+
+    results=asyncio.run(run(args))
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(results,f,indent=2)
+        print(f"\nwrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results,json.load(f))
+
+if __name__=="__main__":
+    main()
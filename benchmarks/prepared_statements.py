@@ -0,0 +1,78 @@
+"""
+Latency of the registered hot statements (database/statements.py) sent as
+plain parameterized queries, parsed and planned on every call, against the
+same statements prepared once on the connection. Also prints the planning
+time Postgres reports for each one, which is the part preparing saves.
+
+Seeds a throwaway user with --expenses rows spread over 12 categories and a
+budget per category, builds its rollup, times each statement and deletes
+the user again. The UPDATE variants target a missing id so nothing changes.
+
+usage: python -m benchmarks.prepared_statements --expenses 100000 --repeat 500
+"""
+import argparse
+import time
+from benchmarks.seed import bench_user
+from database.connection import get_db_connection
+from database.statements import STATEMENTS
+
+def cases(user_id):
+    update={"description":None,"amount":1,"category":None,"date":None,"id":0,"user_id":user_id}
+    return{
+        "user_data_state":(5,user_id),
+        "expense_total":(user_id,),
+        "expense_today":(user_id,),
+        "expense_weekly":(user_id,),
+        "expense_monthly":(user_id,),
+        "expense_lock":(0,user_id),
+        "expense_update":update,
+        "budget_total":(user_id,),
+        "budget_status":(user_id,),
+        "budget_update":{"category":None,"monthly_limit":1,"id":0,"user_id":user_id}
+    }
+
+def run(conn,query,params,prepare):
+    cur=conn.execute(query,params,prepare=prepare)
+    if cur.description:
+        cur.fetchall()
+
+def timed(conn,query,params,repeat,prepare):
+    run(conn,query,params,prepare) #warms the cache and, with prepare, prepares the statement outside the timing
+    started=time.perf_counter()
+    for _ in range(repeat):
+        run(conn,query,params,prepare)
+    conn.rollback()
+    return (time.perf_counter()-started)/repeat*1000
+
+def planning_ms(conn,query,params):
+    plan=conn.execute("EXPLAIN (ANALYZE,SUMMARY,FORMAT JSON) "+query,params,prepare=False).fetchone()
+    conn.rollback()
+    return plan["QUERY PLAN"][0]["Planning Time"]
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses",type=int,default=100000)
+    parser.add_argument("--days",type=int,default=1095)
+    parser.add_argument("--repeat",type=int,default=500)
+    args=parser.parse_args()
+
+    with get_db_connection() as conn:
+        user_id=bench_user(conn,args.expenses,args.days)
+        try:
+            print(f"{args.expenses} expenses, {args.repeat} runs per statement")
+            saved=[]
+            for name,params in cases(user_id).items():
+                query=STATEMENTS[name]
+                plain=timed(conn,query,params,args.repeat,prepare=False)
+                prepared=timed(conn,query,params,args.repeat,prepare=True)
+                planning=planning_ms(conn,query,params)
+                saved.append(plain-prepared)
+                print(f"{name:>16}: plain {plain:7.3f} ms   prepared {prepared:7.3f} ms   planning {planning:6.3f} ms   ({plain/prepared:.2f}x)")
+            print(f"{'mean saved':>16}: {sum(saved)/len(saved):.3f} ms per statement")
+        finally:
+            conn.rollback()
+            conn.execute("DELETE FROM users WHERE id=%s",(user_id,))
+            conn.commit()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency of the summary queries summing raw expenses against the same answers
+read from expense_daily_totals, for one user with a large history.
+
+Seeds a throwaway user with --expenses rows spread over --days days and 12
+categories, builds its rollup, times each query and deletes the user again.
+
+usage: python -m benchmarks.rollup_summaries --expenses 100000 --repeat 50
+"""
+import argparse
+import time
+from benchmarks.seed import bench_user
+from database.connection import get_db_connection
+
+QUERIES={
+    "total":(
+        "SELECT SUM(amount) FROM expenses WHERE user_id=%s",
+        "SELECT SUM(total) FROM expense_daily_totals WHERE user_id=%s"
+    ),
+    "weekly":(
+        "SELECT SUM(amount) FROM expenses WHERE date >= CURRENT_DATE - 7 AND user_id=%s",
+        "SELECT SUM(total) FROM expense_daily_totals WHERE day >= CURRENT_DATE - 7 AND user_id=%s"
+    ),
+    "monthly":(
+        "SELECT SUM(amount) FROM expenses WHERE date >= date_trunc('month',CURRENT_DATE)::date AND user_id=%s",
+        "SELECT SUM(total) FROM expense_daily_totals WHERE day >= date_trunc('month',CURRENT_DATE)::date AND user_id=%s"
+    ),
+    "budget status":(
+        """SELECT b.category,COALESCE(SUM(e.amount),0) FROM budgets b
+           LEFT JOIN expenses e ON b.category=e.category AND e.user_id=b.user_id AND e.date >= date_trunc('month',CURRENT_DATE)::date
+           WHERE b.user_id=%s GROUP BY b.category""",
+        """SELECT b.category,COALESCE(SUM(e.total),0) FROM budgets b
+           LEFT JOIN expense_daily_totals e ON b.category=e.category AND e.user_id=b.user_id AND e.day >= date_trunc('month',CURRENT_DATE)::date
+           WHERE b.user_id=%s GROUP BY b.category"""
+    ),
+}
+
+def timed(conn,query,user_id,repeat):
+    conn.execute(query,(user_id,)).fetchall() #warm the cache
+    started=time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(query,(user_id,)).fetchall()
+    return (time.perf_counter()-started)/repeat*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses",type=int,default=100000)
+    parser.add_argument("--days",type=int,default=1095)
+    parser.add_argument("--repeat",type=int,default=50)
+    args=parser.parse_args()
+
+    with get_db_connection() as conn:
+        user_id=bench_user(conn,args.expenses,args.days)
+        try:
+            print(f"{args.expenses} expenses over {args.days} days")
+            for name,(raw,rolled) in QUERIES.items():
+                before=timed(conn,raw,user_id,args.repeat)
+                after=timed(conn,rolled,user_id,args.repeat)
+                print(f"{name:>14}: expenses {before:8.3f} ms   rollup {after:8.3f} ms   ({before/after:.1f}x)")
+        finally:
+            conn.execute("DELETE FROM users WHERE id=%s",(user_id,))
+            conn.commit()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Latency of GET /expenses/search's query for one user with a large history:
+common and rare words, a typo, and searches narrowed by date or category.
+
+Seeds a throwaway user with --expenses rows whose descriptions come from a
+vocabulary of everyday purchases (each phrase is about 1/40 of the rows) plus
+a handful of unique ones, then times the query search_query() in
+routes/expenses.py builds and deletes the user again. The typo case only
+matches where pg_trgm is installed (migration 0006).
+
+usage: python -m benchmarks.search --expenses 1000000 --repeat 20
+"""
+import argparse
+import statistics
+import time
+from datetime import date,timedelta
+from psycopg import sql
+import config
+from benchmarks.seed import bench_user
+from database.connection import get_db_connection
+from routes.expenses import search_query
+
+PHRASES=[
+    "uber ride home","uber ride to the airport","uber eats dinner","lyft ride","train ticket","bus fare",
+    "coffee at starbucks","morning coffee","lunch with team","dinner with friends","pizza delivery","groceries at walmart",
+    "weekly groceries","farmers market","netflix subscription","spotify subscription","gym membership","yoga class",
+    "electricity bill","water bill","internet bill","phone bill","rent payment","parking fee",
+    "fuel for the car","car wash","oil change","pharmacy","doctor visit","dentist appointment",
+    "movie tickets","concert tickets","books from amazon","amazon order","new shoes","haircut",
+    "birthday gift","flowers","hotel booking","flight to nairobi"
+]
+UNIQUE=["vintage typewriter repair","hot air balloon ride","piano tuning","kayak rental","wedding photographer"]
+
+def seed(conn,expenses):
+    user_id=bench_user(conn,expenses,descriptions=PHRASES,budget=None)
+    #the rare descriptions, left out of the rollup since search never reads it
+    conn.execute("""
+        INSERT INTO expenses(user_id,description,amount,category,date)
+        SELECT %s,d,42,'cat0',CURRENT_DATE-30 FROM unnest(%s::text[]) AS d
+    """,(user_id,UNIQUE))
+    conn.commit()
+    return user_id
+
+def cases():
+    june=date(date.today().year-1,6,1)
+    day=sql.SQL("date>=%s"),sql.SQL("date<=%s")
+    return{
+        "common word":("uber",([],[])),
+        "common phrase":("uber ride",([],[])),
+        "rare word":("kayak",([],[])),
+        "word + month":("coffee",(list(day),[june,june+timedelta(days=29)])),
+        "word + category":("groceries",([sql.SQL("category=ANY(%s)")],[["cat4"]])),
+        "typo":("netflx",([],[])),
+        "no match":("snowboard",([],[]))
+    }
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses",type=int,default=1000000)
+    parser.add_argument("--repeat",type=int,default=20)
+    parser.add_argument("--limit",type=int,default=50)
+    args=parser.parse_args()
+
+    with get_db_connection() as conn:
+        trigram=conn.execute("SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname='pg_trgm') AS installed").fetchone()['installed']
+        if trigram:
+            conn.execute("SELECT set_config('pg_trgm.word_similarity_threshold',%s,false)",(str(config.SEARCH_SIMILARITY),))
+        user_id=seed(conn,args.expenses)
+        try:
+            print(f"{args.expenses} expenses, pg_trgm {'installed' if trigram else 'not installed'}")
+            for name,(q,filters) in cases().items():
+                query,params=search_query(user_id,q,filters,None,args.limit,trigram)
+                rows=conn.execute(query,params).fetchall() #warm the cache
+                times=[]
+                for _ in range(args.repeat):
+                    started=time.perf_counter()
+                    conn.execute(query,params).fetchall()
+                    times.append((time.perf_counter()-started)*1000)
+                conn.rollback()
+                print(f"{name:>16} {q!r:>14}: p50 {statistics.median(times):7.2f} ms   max {max(times):7.2f} ms   {len(rows)} rows")
+        finally:
+            conn.rollback()
+            conn.execute("DELETE FROM users WHERE id=%s",(user_id,))
+            conn.commit()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Synthetic users for the load test, one per history size.
+
+Each user is load-<size>@example.com (password LOAD_PASSWORD) with <size> expenses
+spread over the last three years in 12 categories, a budget per category and a
+built rollup. Users that already have the right number of expenses are kept, so
+seeding again is cheap.
+
+usage: python -m benchmarks.seed --sizes 1000,100000,1000000
+       python -m benchmarks.seed --drop
+"""
+import argparse
+import time
+import uuid
+from database.connection import get_db_connection
+from database.rollup import rebuild
+from utils.passwords import hash_password
+
+LOAD_PASSWORD="LoadTest123"
+EMAIL_DOMAIN="example.com" #the email validator rejects reserved names like .local
+DAYS=1095
+CATEGORIES=12
+
+def email_for(size:int) -> str:
+    return f"load-{size}@{EMAIL_DOMAIN}"
+
+def create_user(conn,email:str,name:str,password_hash:str,size:int,days:int=DAYS,descriptions=None,budget=5000) -> int:
+    #a user with `size` expenses spread over the last `days` days and CATEGORIES categories, with its
+    #rollup built. descriptions: phrases the rows are drawn from in a scattered order, None numbers
+    #them 'seeded expense <i>'. budget: monthly limit of the budget added per category, None adds none
+    user_id=conn.execute(
+        "INSERT INTO users(name,email,hashed_password) VALUES (%s,%s,%s) RETURNING id",
+        (name,email,password_hash)
+    ).fetchone()['id']
+    if descriptions is None:
+        conn.execute("""
+            INSERT INTO expenses(user_id,description,amount,category,date)
+            SELECT %s,'seeded expense '||i,(i%%500)+0.99,'cat'||(i%%%s),CURRENT_DATE-(i%%%s)
+            FROM generate_series(1,%s) AS i
+        """,(user_id,CATEGORIES,days,size))
+    else:
+        conn.execute("""
+            INSERT INTO expenses(user_id,description,amount,category,date)
+            SELECT %s,(%s::text[])[1+(i::bigint*7919)%%%s],(i%%500)+0.99,'cat'||(i%%%s),CURRENT_DATE-(i%%%s)
+            FROM generate_series(1,%s) AS i
+        """,(user_id,list(descriptions),len(descriptions),CATEGORIES,days,size))
+    if budget is not None:
+        conn.execute("""
+            INSERT INTO budgets(user_id,category,monthly_limit)
+            SELECT %s,'cat'||i,%s FROM generate_series(0,%s) AS i
+        """,(user_id,budget,CATEGORIES-1))
+    conn.commit()
+    rebuild(conn,user_id)
+    return user_id
+
+def analyze(conn):
+    #fresh statistics and the hint bits a long-lived table already has, so plans and timings match production
+    conn.autocommit=True
+    conn.execute("VACUUM ANALYZE expenses")
+    conn.execute("VACUUM ANALYZE expense_daily_totals")
+    conn.autocommit=False
+
+def bench_user(conn,size:int,days:int=DAYS,descriptions=None,budget=1000) -> int:
+    #a throwaway user for a benchmark script, which deletes it again when done
+    user_id=create_user(conn,f"bench-{uuid.uuid4().hex}@{EMAIL_DOMAIN}","bench","x",size,days,descriptions,budget)
+    analyze(conn)
+    return user_id
+
+def seed_user(conn,size:int,password_hash:str) -> int:
+    #returns the user id, creating or refilling the user when its history is not `size` rows
+    row=conn.execute("""
+        SELECT u.id,(SELECT COUNT(*) FROM expenses e WHERE e.user_id=u.id) AS expenses
+        FROM users u WHERE u.email=%s
+    """,(email_for(size),)).fetchone()
+    if row and row['expenses']==size:
+        return row['id']
+    if row:
+        conn.execute("DELETE FROM users WHERE id=%s",(row['id'],))
+    return create_user(conn,email_for(size),f"load {size}",password_hash,size)
+
+def seed(sizes) -> dict:
+    #{size: user_id}
+    password_hash=hash_password(LOAD_PASSWORD)
+    users={}
+    with get_db_connection() as conn:
+        for size in sizes:
+            started=time.perf_counter()
+            users[size]=seed_user(conn,size,password_hash)
+            print(f"user {email_for(size)}: {size} expenses ({time.perf_counter()-started:.1f}s)")
+        conn.commit()
+        analyze(conn)
+    return users
+
+def drop():
+    with get_db_connection() as conn:
+        cur=conn.execute("DELETE FROM users WHERE email LIKE %s",(f"load-%@{EMAIL_DOMAIN}",))
+        conn.commit()
+        return cur.rowcount
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes",default="1000,100000,1000000",help="comma separated expense counts")
+    parser.add_argument("--drop",action="store_true",help="delete every load test user instead")
+    args=parser.parse_args()
+    if args.drop:
+        print(f"deleted {drop()} users")
+        return
+    seed([int(size) for size in args.sizes.split(",")])
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Per-request cost of authenticating a bearer token with and without the
+decoded-token cache in routes/auth.py.
+
+usage: python -m benchmarks.token_cache --calls 100000
+"""
+import argparse
+import time
+from routes.auth import create_access_token,decode_access_token,token_cache
+
+def _per_call(func,calls):
+    started=time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter()-started)/calls*1_000_000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls",type=int,default=100000)
+    args=parser.parse_args()
+    token=create_access_token(42)
+
+    def uncached():
+        token_cache.clear()
+        decode_access_token(token)
+
+    def cached():
+        decode_access_token(token)
+
+    cold=_per_call(uncached,args.calls)
+    token_cache.clear()
+    warm=_per_call(cached,args.calls)
+    print(f"jwt.decode every call: {cold:7.2f} us/request")
+    print(f"     token cache hit : {warm:7.2f} us/request  ({cold/warm:.1f}x, saves {cold-warm:.2f} us)")
+    print(token_cache.stats())
+
+if __name__=="__main__":
+    main()
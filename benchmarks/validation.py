@@ -0,0 +1,93 @@
+"""
+Expense validation throughput in items/sec for the paths POST /expenses/bulk could take:
+
+  v1 validators   the previous ExpenseCreate (@validator shim, re.match, float rounding), one item at a time
+  per item        the current ExpenseCreate.model_validate, one item at a time
+  batch           ExpenseBatch (TypeAdapter(list[ExpenseCreate])), the whole list in one call
+  batch json      ExpenseBatch.validate_json straight from the request bytes
+
+usage: python -m benchmarks.validation --items 10000 --repeat 5
+"""
+import argparse
+import json
+import re
+import time
+import warnings
+from datetime import datetime
+from pydantic import BaseModel,Field
+from schemas.expense import ExpenseCreate,ExpenseBatch
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore") #the v1 shim is deprecated, which is the point of comparing against it
+    from pydantic import validator
+
+    class LegacyExpenseCreate(BaseModel):
+        description:str =Field(...,min_length=1,max_length=200)
+        amount:float=Field(...,gt=0)
+        category:str=Field(...,min_length=1,max_length=50)
+        date:str
+
+        @validator('description')
+        def description_not_empty(cls,v):
+            if not v.strip():
+                raise ValueError('Description cannot be empty')
+            return v.strip()
+
+        @validator('amount')
+        def amount_has_max_two_decimals(cls,v):
+            if round(v,2) != v:
+                raise ValueError('Amount can only have up to 2 decimal places')
+            return round(v,2)
+
+        @validator('category')
+        def validate_category(cls,v):
+            if not v.strip():
+                raise ValueError('Category cannot be empty')
+            if not re.match(r'^[a-zA-Z0-9_]+$',v):
+                raise ValueError('Category can only contain letters,numbers,spaces, and underscores')
+            return v.strip()
+
+        @validator('date')
+        def validate_date_format(cls,v):
+            try:
+                datetime.strptime(v,'%d-%m-%Y')
+                return v
+            except ValueError:
+                raise ValueError('Date must be in DD-MM-YYYY format(e.g.,15-02-2003)')
+
+def make_items(count):
+    return [
+        {"description":f"expense {i}","amount":round((i%500)+0.99,2),"category":f"cat{i%12}","date":f"{i%28+1:02d}-{i%12+1:02d}-2024"}
+        for i in range(count)
+    ]
+
+def rate(fn,count,repeat):
+    fn()
+    started=time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return count*repeat/(time.perf_counter()-started)
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items",type=int,default=10000)
+    parser.add_argument("--repeat",type=int,default=5)
+    args=parser.parse_args()
+
+    items=make_items(args.items)
+    body=json.dumps(items).encode()
+    paths={
+        "v1 validators":lambda:[LegacyExpenseCreate.model_validate(item) for item in items],
+        "per item":lambda:[ExpenseCreate.model_validate(item) for item in items],
+        "batch":lambda:ExpenseBatch.validate_python(items),
+        "batch json":lambda:ExpenseBatch.validate_json(body),
+    }
+    print(f"{args.items} expenses")
+    baseline=None
+    for name,fn in paths.items():
+        per_sec=rate(fn,args.items,args.repeat)
+        baseline=baseline or per_sec
+        print(f"  {name:>14}: {per_sec:12,.0f} items/sec  ({per_sec/baseline:.1f}x)")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+#loading the environment variables
+load_dotenv(override=True)
+
+#applying pending database/migrations on app startup (python -m database.migrate does the same by hand)
+MIGRATE_ON_STARTUP=os.getenv("MIGRATE_ON_STARTUP","false").lower() in ("1","true","yes")
+
+#database connection pool sizes, per worker process
+DB_POOL_MIN_SIZE=int(os.getenv("DB_POOL_MIN_SIZE","2"))
+DB_POOL_MAX_SIZE=int(os.getenv("DB_POOL_MAX_SIZE","10"))
+#how long a request waits for a free connection before giving up (seconds)
+DB_POOL_TIMEOUT=float(os.getenv("DB_POOL_TIMEOUT","10"))
+#connections idle longer than this are pinged before being handed out (seconds)
+DB_POOL_CHECK_IDLE=float(os.getenv("DB_POOL_CHECK_IDLE","30"))
+
+#read replicas for GET handlers: comma separated conninfo strings or postgresql:// URLs, empty keeps every read
+#on the primary. missing settings (user, password, dbname) come from the PG* variables like the primary's
+DB_REPLICA_URLS=[url.strip() for url in os.getenv("DB_REPLICA_URLS","").split(",") if url.strip()]
+#how long a read waits for a replica connection before it falls back to the primary (seconds)
+DB_REPLICA_TIMEOUT=float(os.getenv("DB_REPLICA_TIMEOUT","1"))
+#seconds between replica health checks, a replica that fails one is skipped until it passes again
+DB_REPLICA_CHECK_INTERVAL=float(os.getenv("DB_REPLICA_CHECK_INTERVAL","5"))
+#a user's reads stay on the primary for this long after their own write, so replica lag never hides it (seconds)
+READ_YOUR_WRITES_SECONDS=float(os.getenv("READ_YOUR_WRITES_SECONDS","5"))
+
+#statements slower than this are logged with the shape of their parameters (milliseconds)
+SLOW_QUERY_MS=float(os.getenv("SLOW_QUERY_MS","200"))
+
+#rows fetched per round trip when streaming an export
+EXPORT_BATCH_SIZE=int(os.getenv("EXPORT_BATCH_SIZE","2000"))
+#GET /expenses/search: how close a word must be to a word of the description to count as a
+#typo match, 0..1 (pg_trgm word_similarity, only used where pg_trgm is installed)
+SEARCH_SIMILARITY=float(os.getenv("SEARCH_SIMILARITY","0.4"))
+#matches ranked per search, the newest ones. older matches are reached by narrowing with from/to
+SEARCH_MAX_CANDIDATES=int(os.getenv("SEARCH_MAX_CANDIDATES","1000"))
+
+#largest batch accepted by POST /expenses/bulk
+BULK_MAX_ITEMS=int(os.getenv("BULK_MAX_ITEMS","10000"))
+#largest body accepted by POST /expenses/bulk (bytes), checked while the upload arrives
+BULK_MAX_BYTES=int(os.getenv("BULK_MAX_BYTES",str(8*1024*1024)))
+
+#production server (python server.py): one worker process per core by default
+WEB_WORKERS=int(os.getenv("WEB_WORKERS",str(os.cpu_count() or 1)))
+HOST=os.getenv("HOST","0.0.0.0")
+PORT=int(os.getenv("PORT","8000"))
+#on SIGTERM in-flight requests get this long to finish before the worker exits (seconds)
+GRACEFUL_TIMEOUT=float(os.getenv("GRACEFUL_TIMEOUT","30"))
+
+#password hashing: bcrypt cost and the process pool it runs in.
+#every web worker has its own pool, so by default the cores are shared out between them
+BCRYPT_ROUNDS=int(os.getenv("BCRYPT_ROUNDS","12"))
+HASH_WORKERS=int(os.getenv("HASH_WORKERS",str(max(1,(os.cpu_count() or 1)//WEB_WORKERS))))
+#hashes allowed to wait or run at once, beyond this login/register answer 503
+HASH_QUEUE_SIZE=int(os.getenv("HASH_QUEUE_SIZE",str(HASH_WORKERS*8)))
+
+#verified access tokens kept in memory so repeat requests skip jwt.decode
+TOKEN_CACHE_SIZE=int(os.getenv("TOKEN_CACHE_SIZE","10000"))
+
+#how long a login can be kept alive through /auth/refresh (days)
+REFRESH_TOKEN_EXPIRE_DAYS=int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS","30"))
+#expired refresh tokens deleted by each login or refresh, so the table holds only live tokens
+REFRESH_TOKEN_PRUNE_BATCH=int(os.getenv("REFRESH_TOKEN_PRUNE_BATCH","100"))
+
+#per-user dashboard results kept in memory between writes
+DASHBOARD_CACHE_SIZE=int(os.getenv("DASHBOARD_CACHE_SIZE","10000"))
+DASHBOARD_CACHE_TTL=float(os.getenv("DASHBOARD_CACHE_TTL","300"))
+
+#per-user analytics results kept in memory between writes
+ANALYTICS_CACHE_SIZE=int(os.getenv("ANALYTICS_CACHE_SIZE","10000"))
+ANALYTICS_CACHE_TTL=float(os.getenv("ANALYTICS_CACHE_TTL","300"))
+
+#token buckets per route class as "<requests per second>/<burst>", one bucket per user and one per client IP.
+#auth is limited per IP only, the other classes per user and per IP (RATE_LIMIT_IP_MULTIPLIER times the user limit,
+#since many users can share an address)
+def _rate(name:str,default:str) -> tuple[float,float]:
+    rate,burst=os.getenv(name,default).split("/")
+    return float(rate),float(burst)
+
+RATE_LIMIT_ENABLED=os.getenv("RATE_LIMIT_ENABLED","true").lower() in ("1","true","yes")
+RATE_LIMITS={
+    "auth":_rate("RATE_LIMIT_AUTH","0.5/10"),
+    "reads":_rate("RATE_LIMIT_READS","20/100"),
+    "writes":_rate("RATE_LIMIT_WRITES","10/50"),
+    "exports":_rate("RATE_LIMIT_EXPORTS","0.1/3")
+}
+RATE_LIMIT_IP_MULTIPLIER=float(os.getenv("RATE_LIMIT_IP_MULTIPLIER","4"))
+#buckets kept in memory, the least recently used are dropped (and start full again) beyond this
+RATE_LIMIT_MAX_KEYS=int(os.getenv("RATE_LIMIT_MAX_KEYS","100000"))
+
+#requests allowed to use the database at once (0 turns the cap off), how many more may wait
+#and for how long (seconds) before they are turned away with 429. by default one pool's worth
+#per database, since reads served by a replica hold no primary connection
+DB_ADMISSION_LIMIT=int(os.getenv("DB_ADMISSION_LIMIT",str(DB_POOL_MAX_SIZE*(1+len(DB_REPLICA_URLS)))))
+DB_ADMISSION_QUEUE=int(os.getenv("DB_ADMISSION_QUEUE",str(DB_ADMISSION_LIMIT*4)))
+DB_ADMISSION_TIMEOUT=float(os.getenv("DB_ADMISSION_TIMEOUT","1"))
+
+#per-request profiling: requests sending "X-Profile: <PROFILE_TOKEN>" are profiled, empty turns it off
+PROFILE_TOKEN=os.getenv("PROFILE_TOKEN","")
+PROFILE_DIR=os.getenv("PROFILE_DIR",os.path.join(tempfile.gettempdir(),"expense-tracker-profiles"))
@@ -1,18 +1,273 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncio
+import itertools
+import logging
 import os
-from dotenv import load_dotenv
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo,conninfo_to_dict
+from psycopg.pq import TransactionStatus
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool,PoolTimeout
+from fastapi import HTTPException,status
+import config
+from utils.metrics import QUERY_DURATION,SLOW_QUERIES,READS
 
-#loading the environment variables
-load_dotenv(override=True)
+logger=logging.getLogger(__name__)
 
-def get_db_connection():
-   conn= psycopg2.connect(
+def _conninfo():
+   return make_conninfo(
       host=os.getenv("PGHOST"),
-      database=os.getenv("PGDATABASE"),
+      dbname=os.getenv("PGDATABASE"),
       user=os.getenv("PGUSER"),
-      password=os.getenv("PGPASSWORD"),
-      cursor_factory=RealDictCursor
+      password=os.getenv("PGPASSWORD")
    )
+
+#opens a single unpooled (blocking) connection, used by scripts that run outside the app
+def get_db_connection():
+   conn= psycopg.connect(_conninfo(),row_factory=dict_row)
    return conn
-    
\ No newline at end of file
+
+
+#every statement on a pooled connection is timed for /metrics, statements slower than
+#SLOW_QUERY_MS are logged with the shape of their parameters (types and lengths, never values)
+def _statement(cursor,query) -> str:
+   if isinstance(query,sql.Composable):
+      query=query.as_string(cursor)
+   elif isinstance(query,bytes):
+      query=query.decode()
+   return query
+
+def _shape(value) -> str:
+   if isinstance(value,(list,tuple,str,bytes)):
+      return f"{type(value).__name__}[{len(value)}]"
+   return type(value).__name__
+
+def param_shape(params) -> str:
+   if params is None:
+      return "none"
+   if isinstance(params,dict):
+      return "{"+", ".join(f"{key}: {_shape(value)}" for key,value in params.items())+"}"
+   return "("+", ".join(map(_shape,params))+")"
+
+#set by the request profiler (utils/profiling.py): the statements of that one request are collected here
+query_log=ContextVar("query_log",default=None)
+
+def record_query(cursor,query,params,elapsed:float):
+   statement=_statement(cursor,query)
+   operation=statement.lstrip().split(None,1)[0].upper() #SELECT, INSERT, WITH, ...
+   QUERY_DURATION.observe(operation,value=elapsed)
+   if elapsed*1000>=config.SLOW_QUERY_MS:
+      SLOW_QUERIES.inc(operation)
+      logger.warning("slow query %.1f ms: %s | params %s",elapsed*1000," ".join(statement.split())[:1000],param_shape(params))
+   log=query_log.get()
+   if log is not None:
+      log.append({"ms":round(elapsed*1000,3),"statement":" ".join(statement.split()),"params":param_shape(params)})
+
+class _TimedExecute:
+   async def execute(self,query,params=None,**kwargs):
+      started=time.perf_counter()
+      try:
+         return await super().execute(query,params,**kwargs)
+      finally:
+         record_query(self,query,params,time.perf_counter()-started)
+
+class TimedCursor(_TimedExecute,psycopg.AsyncCursor):
+   pass
+
+class TimedServerCursor(_TimedExecute,psycopg.AsyncServerCursor):
+   pass #named cursors (the export stream)
+
+#connection -> time it was last checked in, entries go away with connections the pool closes
+_last_used=weakref.WeakKeyDictionary()
+#when a connection last came back broken or a replica failed its health check. a server restart
+#breaks every idle connection at once, so after one failure all of them are pinged on their next checkout
+_lost_at=0.0
+
+async def _configure(conn):
+   conn.server_cursor_factory=TimedServerCursor
+   _last_used[conn]=time.monotonic() #just connected, no need to ping it
+
+async def _check(conn):
+   #cheap round trip to catch connections the server or a proxy already dropped, only for
+   #connections that sat idle longer than DB_POOL_CHECK_IDLE or were idle when another one broke,
+   #so busy ones go straight out. a plain cursor keeps the ping out of the query metrics
+   last_used=_last_used.get(conn,0)
+   if last_used>_lost_at and time.monotonic()-last_used<config.DB_POOL_CHECK_IDLE:
+      return
+   async with psycopg.AsyncCursor(conn) as cur:
+      await cur.execute("SELECT 1")
+   await conn.rollback()
+
+#async connection pool shared by all requests, opened in the app lifespan (main2.py)
+_pool=None
+
+async def open_pool(min_size=None,max_size=None):
+   global _pool
+   if _pool is not None:
+      return _pool
+   pool=AsyncConnectionPool(
+      _conninfo(),
+      min_size=config.DB_POOL_MIN_SIZE if min_size is None else min_size,
+      max_size=config.DB_POOL_MAX_SIZE if max_size is None else max_size,
+      timeout=config.DB_POOL_TIMEOUT,
+      kwargs={"row_factory":dict_row,"cursor_factory":TimedCursor},
+      configure=_configure,
+      check=_check, #pings connections that sat idle before handing them out
+      open=False
+   )
+   await pool.open(wait=True)
+   _pool=pool
+   return _pool
+
+async def close_pool():
+   global _pool
+   if _pool is not None:
+      await _pool.close()
+   _pool=None
+
+async def checkout():
+   #taking a connection out of the pool, waiting up to DB_POOL_TIMEOUT for one to be free
+   if _pool is None:
+      raise RuntimeError("Connection pool is not open")
+   try:
+      return await _pool.getconn()
+   except PoolTimeout:
+      raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail="Database is busy, try again")
+
+def connection_lost():
+   global _lost_at
+   _lost_at=time.monotonic()
+
+async def checkin(conn,pool=None):
+   #returning a connection, rolling back anything the handler left open
+   if not conn.closed and conn.info.transaction_status!=TransactionStatus.IDLE:
+      try:
+         await conn.rollback()
+      except psycopg.Error:
+         pass #a broken connection is discarded by the pool
+   if conn.broken:
+      connection_lost()
+   _last_used[conn]=time.monotonic()
+   await (pool or _pool).putconn(conn)
+
+@asynccontextmanager
+async def pooled_connection():
+   conn=await checkout()
+   try:
+      yield conn
+   finally:
+      await checkin(conn)
+
+#FastAPI dependency: the connection goes back to the pool even if the handler raises
+async def get_db():
+   async with pooled_connection() as conn:
+      yield conn
+
+def pool_stats():
+   if _pool is None:
+      return {}
+   return _pool.get_stats()
+
+
+#read replicas from DB_REPLICA_URLS, one pool each. read_connection() hands them out round-robin,
+#skipping any that failed its last health check, and falls back to the primary when none is usable
+class Replica:
+   def __init__(self,name,pool):
+      self.name=name
+      self.pool=pool
+      self.healthy=True
+
+   def mark(self,healthy:bool):
+      #only the drop itself marks idle connections for a ping, a replica that stays down
+      #keeps failing its checks and would otherwise ping every checkout until it is back
+      if self.healthy and not healthy:
+         connection_lost()
+      if healthy!=self.healthy:
+         logger.warning("replica %s is %s",self.name,"back" if healthy else "down, reading from the primary")
+      self.healthy=healthy
+
+_replicas=[]
+_next_replica=itertools.count()
+_health_task=None
+
+def _replica_name(url:str) -> str:
+   #host:port only, never the password
+   params=conninfo_to_dict(url)
+   return f"{params.get('host') or os.getenv('PGHOST') or 'localhost'}:{params.get('port') or os.getenv('PGPORT') or 5432}"
+
+async def open_replicas():
+   global _health_task
+   for url in config.DB_REPLICA_URLS:
+      pool=AsyncConnectionPool(
+         url,
+         min_size=1,
+         max_size=config.DB_POOL_MAX_SIZE,
+         timeout=config.DB_REPLICA_TIMEOUT,
+         kwargs={"row_factory":dict_row,"cursor_factory":TimedCursor},
+         configure=_configure,
+         check=_check,
+         open=False
+      )
+      await pool.open(wait=False) #a replica that is down must not stop the app from starting
+      _replicas.append(Replica(_replica_name(url),pool))
+   if _replicas:
+      _health_task=asyncio.create_task(_check_replicas())
+
+async def close_replicas():
+   global _health_task
+   if _health_task is not None:
+      _health_task.cancel()
+      _health_task=None
+   for replica in _replicas:
+      await replica.pool.close()
+   _replicas.clear()
+
+async def _check_replicas():
+   while True:
+      for replica in _replicas:
+         try:
+            async with replica.pool.connection() as conn:
+               await conn.execute("SELECT 1")
+            replica.mark(True)
+         except (PoolTimeout,psycopg.Error):
+            replica.mark(False)
+      await asyncio.sleep(config.DB_REPLICA_CHECK_INTERVAL)
+
+def _pick_replica():
+   for _ in range(len(_replicas)):
+      replica=_replicas[next(_next_replica)%len(_replicas)]
+      if replica.healthy:
+         return replica
+   return None
+
+def has_replicas() -> bool:
+   return bool(_replicas)
+
+@asynccontextmanager
+async def read_connection(use_primary:bool=False):
+   #a replica connection for a read-only handler, or a primary one when use_primary is set
+   #(read-your-writes) or no healthy replica answers within DB_REPLICA_TIMEOUT
+   replica=None if use_primary else _pick_replica()
+   conn=None
+   if replica is not None:
+      try:
+         conn=await replica.pool.getconn()
+      except (PoolTimeout,psycopg.Error):
+         replica.mark(False)
+   if conn is None:
+      READS.inc("primary")
+      async with pooled_connection() as primary:
+         yield primary
+      return
+   READS.inc("replica")
+   try:
+      yield conn
+   finally:
+      await checkin(conn,replica.pool)
+
+def replica_stats():
+   return [{"name":replica.name,"healthy":replica.healthy,**replica.pool.get_stats()} for replica in _replicas]
@@ -0,0 +1,150 @@
+"""
+Versioned schema migrations.
+
+Every file in database/migrations/ is one version. Pending files are applied in
+name order, each in its own transaction, and recorded in schema_migrations.
+Runs at app startup when MIGRATE_ON_STARTUP is set, or from the command line:
+
+    python -m database.migrate           apply pending migrations
+    python -m database.migrate status    list applied and pending versions
+    python -m database.migrate check     EXPLAIN the route queries, fail on sequential scans
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from psycopg import sql
+from database.connection import get_db_connection
+
+MIGRATIONS_DIR=Path(__file__).parent/"migrations"
+#pg_advisory_lock key, so several workers starting at once apply each migration only once
+LOCK_KEY=72_615_001
+
+def available():
+    return [(path.stem,path) for path in sorted(MIGRATIONS_DIR.glob("*.sql"))]
+
+def applied_versions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+    return {row['version'] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+def migrate():
+    #applying every pending migration, returns the versions that were applied
+    newly_applied=[]
+    with get_db_connection() as conn:
+        conn.autocommit=True #each migration gets its own explicit transaction below
+        conn.execute("SELECT pg_advisory_lock(%s)",(LOCK_KEY,))
+        try:
+            done=applied_versions(conn)
+            for version,path in available():
+                if version in done:
+                    continue
+                with conn.transaction():
+                    conn.execute(path.read_text())
+                    conn.execute("INSERT INTO schema_migrations(version) VALUES (%s)",(version,))
+                newly_applied.append(version)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)",(LOCK_KEY,))
+    return newly_applied
+
+def status():
+    with get_db_connection() as conn:
+        done=applied_versions(conn)
+        conn.commit()
+    return [(version,version in done) for version,_ in available()]
+
+
+#the hot query of each route with sample parameters, built by the same code the route runs.
+#each one must be answerable from an index
+def _route_queries():
+    from routes.analytics import ANALYTICS_SQL
+    from routes.auth import LOGIN_SQL,ME_SQL,REFRESH_SQL,REVOKE_FAMILY_SQL,PRUNE_SQL
+    from routes.budgets import budgets_query,BUDGET_FIELDS
+    from routes.dashboard import DASHBOARD_SQL
+    from routes.expenses import expenses_query,export_query,search_query,expense_filters,EXPENSE_FIELDS
+    from database.statements import STATEMENTS
+    from utils.pagination import encode_cursor
+    today=date.today()
+    no_filters=expense_filters(from_date=None,to_date=None,category=None,min_amount=None,max_amount=None)
+    filtered=expense_filters(from_date=today,to_date=today,category=["food","bus"],min_amount=Decimal(50),max_amount=None)
+    return{
+        "GET /expenses":expenses_query(1,no_filters,None,50,EXPENSE_FIELDS),
+        "GET /expenses next page":expenses_query(1,no_filters,encode_cursor(today,1),50,EXPENSE_FIELDS),
+        "GET /expenses filtered":expenses_query(1,filtered,None,50,EXPENSE_FIELDS),
+        "GET /expenses/search":search_query(1,"uber ride",no_filters,None,50,trigram=False),
+        "GET /expenses/export":export_query(1,no_filters),
+        "GET /expenses/export filtered":export_query(1,filtered),
+        "PUT /expenses/{id}":(STATEMENTS["expense_lock"],(1,1)),
+        "PUT /expenses/{id} update":(STATEMENTS["expense_update"],{"description":None,"amount":1,"category":None,"date":None,"id":1,"user_id":1}),
+        "DELETE /expenses/{id}":(STATEMENTS["expense_delete"],(1,1)),
+        "GET /expenses/total":(STATEMENTS["expense_total"],(1,)),
+        "GET /expenses/summary/monthly":(STATEMENTS["expense_monthly"],(1,)),
+        "GET /budgets":budgets_query(1,None,50,BUDGET_FIELDS),
+        "GET /budgets next page":budgets_query(1,encode_cursor(Decimal(100),1),50,BUDGET_FIELDS),
+        "GET /budgets/total":(STATEMENTS["budget_total"],(1,)),
+        "GET /budgets/status":(STATEMENTS["budget_status"],(1,)),
+        "POST /budgets":(STATEMENTS["budget_insert"],("food",1,1)),
+        "PUT /budgets/{id}":(STATEMENTS["budget_update"],{"category":None,"monthly_limit":1,"id":1,"user_id":1}),
+        "GET /dashboard":(DASHBOARD_SQL,{"user_id":1}),
+        "GET /analytics":(ANALYTICS_SQL,(1,today)),
+        "POST /auth/login":(LOGIN_SQL,("a@example.com",)),
+        "GET /auth/me":(ME_SQL,(1,)),
+        "POST /auth/refresh":(REFRESH_SQL,("x"*64,)),
+        "POST /auth/refresh reuse":(REVOKE_FAMILY_SQL,("x"*64,)),
+        "POST /auth/refresh prune":(PRUNE_SQL,(100,)),
+    }
+
+def _seq_scans(plan):
+    found=[]
+    if plan.get("Node Type")=="Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans",[]):
+        found.extend(_seq_scans(child))
+    return found
+
+def check():
+    #returns {route: [tables read with a sequential scan]} for every route that is not index backed.
+    #enable_seqscan=off makes the planner use an index whenever one can answer the query,
+    #so small development tables give the same answer as big production ones
+    failures={}
+    with get_db_connection() as conn:
+        conn.execute("SET LOCAL enable_seqscan=off")
+        for route,(query,params) in _route_queries().items():
+            explain=sql.SQL("EXPLAIN (FORMAT JSON) {}").format(query if isinstance(query,sql.Composable) else sql.SQL(query)) #list queries are composed
+            plan=conn.execute(explain,params).fetchone()
+            plan=plan["QUERY PLAN"]
+            if isinstance(plan,str):
+                plan=json.loads(plan)
+            scans=_seq_scans(plan[0]["Plan"])
+            if scans:
+                failures[route]=scans
+        conn.rollback()
+    return failures
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command",nargs="?",default="up",choices=["up","status","check"])
+    args=parser.parse_args(argv)
+
+    if args.command=="status":
+        for version,done in status():
+            print(f"[{'x' if done else ' '}] {version}")
+        return 0
+    if args.command=="check":
+        failures=check()
+        for route,tables in failures.items():
+            print(f"FAIL {route}: sequential scan on {', '.join(tables)}")
+        print(f"{len(failures)} routes without an index" if failures else "every route query uses an index")
+        return 1 if failures else 0
+    versions=migrate()
+    print("\n".join(f"applied {v}" for v in versions) or "database is up to date")
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
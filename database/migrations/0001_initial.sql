@@ -0,0 +1,80 @@
+-- Create users table
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    hashed_password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create expenses table
+CREATE TABLE IF NOT EXISTS expenses (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    description VARCHAR(200) NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL CHECK (amount > 0),
+    category VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create budgets table
+CREATE TABLE IF NOT EXISTS budgets (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL,
+    monthly_limit DECIMAL(10, 2) NOT NULL CHECK (monthly_limit > 0),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, category)
+);
+
+-- Create per-user daily totals, kept in step with expenses by the API
+CREATE TABLE IF NOT EXISTS expense_daily_totals (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, category)
+);
+
+-- Fill the daily totals from the expenses already in the database (upgrades from init.sql).
+-- A date column that is still text is converted by 0003, which fills the table then
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'expenses' AND column_name = 'date') = 'date' THEN
+
+        INSERT INTO expense_daily_totals(user_id, day, category, total, count)
+        SELECT user_id, date, category, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY user_id, date, category
+        ON CONFLICT DO NOTHING;
+    END IF;
+END $$;
+
+-- Create refresh tokens table (only the sha256 of each token is stored)
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash CHAR(64) UNIQUE NOT NULL,
+    family_id UUID NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create indexes for the queries in routes/*.py
+-- (users.email and budgets(user_id, category) are already indexed by their UNIQUE constraints)
+-- expense lists, exports, date ranges and keyset pagination on (date, id)
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date_id ON expenses(user_id, date DESC, id DESC);
+-- per-category filters and budget comparisons
+CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date ON expenses(user_id, category, date);
+-- budget lists and keyset pagination on (monthly_limit, id)
+CREATE INDEX IF NOT EXISTS idx_budgets_user_limit_id ON budgets(user_id, monthly_limit DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id);
+
+-- Insert sample data (optional - remove in production)
+-- INSERT INTO users (name, email, hashed_password) VALUES 
+-- ('Demo User', 'demo@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5GyVK9S/9nwhe');
+-- Password is: demo123
\ No newline at end of file
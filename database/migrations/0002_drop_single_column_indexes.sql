@@ -0,0 +1,6 @@
+-- Databases created from the old init.sql have single-column indexes that the
+-- composite indexes in 0001 make redundant; they only slow down writes
+DROP INDEX IF EXISTS idx_expenses_user_id;
+DROP INDEX IF EXISTS idx_expenses_date;
+DROP INDEX IF EXISTS idx_expenses_category;
+DROP INDEX IF EXISTS idx_budgets_user_id;
@@ -0,0 +1,24 @@
+-- Databases created from the original init.sql can hold expenses.date as text
+-- (DD-MM-YYYY strings). Convert the column to DATE in place, accepting both
+-- DD-MM-YYYY and ISO values, then rebuild the daily totals from the typed dates.
+-- Nothing happens when the column is already DATE.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'expenses' AND column_name = 'date') <> 'date' THEN
+
+        ALTER TABLE expenses ALTER COLUMN date TYPE DATE USING (
+            CASE
+                WHEN date::text ~ '^\d{4}-\d{2}-\d{2}$' THEN to_date(date::text, 'YYYY-MM-DD')
+                ELSE to_date(date::text, 'DD-MM-YYYY')
+            END
+        );
+        ALTER TABLE expenses ALTER COLUMN date SET NOT NULL;
+
+        DELETE FROM expense_daily_totals;
+        INSERT INTO expense_daily_totals(user_id, day, category, total, count)
+        SELECT user_id, date, category, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY user_id, date, category;
+    END IF;
+END $$;
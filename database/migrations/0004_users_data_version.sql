@@ -0,0 +1,3 @@
+-- Per-user data version, bumped in the same transaction as every expense or budget
+-- write. Caches and ETags compare against it, in every worker process.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,4 @@
+-- When the user's data last changed, set together with data_version. Reads stay on the
+-- primary for READ_YOUR_WRITES_SECONDS after it. New users start at their registration
+-- time so a read right after registering does not hit a replica that lacks the row.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS data_changed_at TIMESTAMPTZ DEFAULT NOW();
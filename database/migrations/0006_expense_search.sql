@@ -0,0 +1,17 @@
+-- Search over expense descriptions (GET /expenses/search). The tsvector is a
+-- generated column, so every insert and update keeps it current without the API
+-- writing it, and the GIN index answers the full-text match.
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS search tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', description)) STORED;
+CREATE INDEX IF NOT EXISTS idx_expenses_search ON expenses USING GIN (search);
+
+-- Trigram index for typo tolerance ("ubr" finds "uber"). pg_trgm ships in PostgreSQL's
+-- contrib package (the official docker images, RDS, Cloud SQL). Where it is not
+-- installed, search still works, but only on whole words.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_expenses_description_trgm ON expenses USING GIN (description gin_trgm_ops);
+    END IF;
+END $$;
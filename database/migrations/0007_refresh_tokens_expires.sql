@@ -0,0 +1,3 @@
+-- Every login and refresh deletes a batch of expired refresh tokens (routes/auth.py),
+-- this index finds them without reading the live ones
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens(expires_at);
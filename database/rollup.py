@@ -0,0 +1,85 @@
+"""
+Per-user daily totals (expense_daily_totals) that the summary endpoints read
+instead of summing every expense row.
+
+routes/expenses.py keeps the table up to date inside the same transaction as
+each write. The command line checks it against the expenses table and rebuilds it:
+
+    python -m database.rollup verify [--user-id N]
+    python -m database.rollup rebuild [--user-id N]
+"""
+import argparse
+import sys
+from database.connection import get_db_connection
+from database.statements import execute
+
+async def apply_rollup(conn,user_id:int,added=(),removed=()):
+    #added/removed are expense rows (anything with date, category and amount keys)
+    changes=[(row['date'],row['category'],row['amount'],1) for row in added]
+    changes+=[(row['date'],row['category'],-row['amount'],-1) for row in removed]
+    if not changes:
+        return
+    days,categories,amounts,counts=zip(*changes)
+    await execute(conn,"rollup_apply",(user_id,list(days),list(categories),list(amounts),list(counts)))
+
+
+REBUILD_SQL="""
+    INSERT INTO expense_daily_totals(user_id,day,category,total,count)
+    SELECT user_id,date,category,SUM(amount),COUNT(*)
+    FROM expenses
+    WHERE %(user_id)s::int IS NULL OR user_id=%(user_id)s
+    GROUP BY user_id,date,category
+"""
+
+#rows where the rollup and a fresh aggregate of expenses disagree
+VERIFY_SQL="""
+    WITH actual AS (
+        SELECT user_id,date AS day,category,SUM(amount) AS total,COUNT(*) AS count
+        FROM expenses
+        WHERE %(user_id)s::int IS NULL OR user_id=%(user_id)s
+        GROUP BY user_id,date,category
+    ),
+    rolled AS (
+        SELECT user_id,day,category,total,count
+        FROM expense_daily_totals
+        WHERE count<>0 AND (%(user_id)s::int IS NULL OR user_id=%(user_id)s)
+    )
+    SELECT user_id,day,category,rolled.total AS rollup_total,actual.total AS actual_total,
+           rolled.count AS rollup_count,actual.count AS actual_count
+    FROM rolled FULL OUTER JOIN actual USING (user_id,day,category)
+    WHERE rolled.total IS DISTINCT FROM actual.total OR rolled.count IS DISTINCT FROM actual.count
+    ORDER BY user_id,day,category
+"""
+
+def rebuild(conn,user_id=None):
+    #recomputing from scratch in one transaction, readers see either the old or the new totals
+    with conn.transaction():
+        conn.execute(
+            "DELETE FROM expense_daily_totals WHERE %(user_id)s::int IS NULL OR user_id=%(user_id)s",
+            {"user_id":user_id}
+        )
+        cur=conn.execute(REBUILD_SQL,{"user_id":user_id})
+        return cur.rowcount
+
+def verify(conn,user_id=None):
+    return conn.execute(VERIFY_SQL,{"user_id":user_id}).fetchall()
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command",choices=["verify","rebuild"])
+    parser.add_argument("--user-id",type=int,help="only this user (default: everyone)")
+    args=parser.parse_args(argv)
+
+    with get_db_connection() as conn:
+        if args.command=="rebuild":
+            print(f"rebuilt {rebuild(conn,args.user_id)} rollup rows")
+            return 0
+        drift=verify(conn,args.user_id)
+        for row in drift:
+            print(f"user {row['user_id']} {row['day']} {row['category']}: "
+                  f"rollup {row['rollup_total']} ({row['rollup_count']}) != expenses {row['actual_total']} ({row['actual_count']})")
+        print(f"{len(drift)} rows out of sync" if drift else "rollup matches expenses")
+        return 1 if drift else 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#the hot statement set, run by name with prepare=True: each pooled connection (primary or replica)
+#parses and plans a statement the first time it runs it, later calls send only the name and the
+#parameters. everything here is fixed text, anything built per request (filters, ?fields=) stays
+#with psycopg's automatic preparing after prepare_threshold runs.
+#RETURNING lists its columns: with * a column added by a migration changes the result type of a
+#statement already prepared on every pooled connection, and each of them fails once
+EXPENSE_COLUMNS="id,user_id,description,amount,category,date,created_at"
+BUDGET_COLUMNS="id,user_id,category,monthly_limit,created_at"
+
+STATEMENTS={
+    #expenses
+    "expense_insert":"INSERT INTO expenses(description,amount,category,date,user_id) VALUES(%s,%s,%s,%s,%s) RETURNING "+EXPENSE_COLUMNS,
+    "expense_insert_bulk":"""
+        INSERT INTO expenses(description,amount,category,date,user_id)
+        SELECT description,amount,category,day,%s
+        FROM unnest(%s::text[],%s::numeric[],%s::text[],%s::date[]) WITH ORDINALITY AS t(description,amount,category,day,n)
+        ORDER BY n
+        RETURNING id,date,category,amount
+    """,
+    "expense_lock":"SELECT date,category,amount FROM expenses WHERE id=%s AND user_id=%s FOR UPDATE",
+    #one UPDATE for any subset of fields: a NULL parameter keeps the column (every column is NOT NULL)
+    "expense_update":"""
+        UPDATE expenses SET
+            description=COALESCE(%(description)s,description),
+            amount=COALESCE(%(amount)s,amount),
+            category=COALESCE(%(category)s,category),
+            date=COALESCE(%(date)s,date)
+        WHERE id=%(id)s AND user_id=%(user_id)s
+        RETURNING """+EXPENSE_COLUMNS,
+    "expense_delete":"DELETE FROM expenses WHERE id=%s AND user_id=%s RETURNING date,category,amount",
+    "expense_total":"SELECT SUM(total) AS total FROM expense_daily_totals WHERE user_id=%s",
+    "expense_today":"SELECT SUM(total) AS total FROM expense_daily_totals WHERE day=CURRENT_DATE AND user_id=%s",
+    "expense_weekly":"SELECT SUM(total) AS weekly_total FROM expense_daily_totals WHERE day>=CURRENT_DATE-7 AND user_id=%s",
+    "expense_monthly":"SELECT SUM(total) AS monthly_total FROM expense_daily_totals WHERE day>=date_trunc('month',CURRENT_DATE)::date AND user_id=%s",
+    #adds (or with negative numbers removes) amounts and counts in expense_daily_totals, grouped
+    #first because ON CONFLICT cannot touch the same row twice in one statement. sorted so every
+    #write locks a user's rollup rows in the same order, concurrent writes then wait instead of deadlocking
+    "rollup_apply":"""
+        INSERT INTO expense_daily_totals AS t(user_id,day,category,total,count)
+        SELECT %s,day,category,SUM(amount),SUM(n)
+        FROM unnest(%s::date[],%s::text[],%s::numeric[],%s::int[]) AS d(day,category,amount,n)
+        GROUP BY day,category
+        ORDER BY day,category
+        ON CONFLICT (user_id,day,category) DO UPDATE
+        SET total=t.total+EXCLUDED.total,count=t.count+EXCLUDED.count
+    """,
+
+    #budgets
+    "budget_insert":"INSERT INTO budgets(category,monthly_limit,user_id) VALUES(%s,%s,%s) ON CONFLICT (user_id,category) DO NOTHING RETURNING "+BUDGET_COLUMNS,
+    "budget_update":"""
+        UPDATE budgets SET
+            category=COALESCE(%(category)s,category),
+            monthly_limit=COALESCE(%(monthly_limit)s,monthly_limit)
+        WHERE id=%(id)s AND user_id=%(user_id)s
+        RETURNING """+BUDGET_COLUMNS,
+    "budget_delete":"DELETE FROM budgets WHERE id=%s AND user_id=%s RETURNING id",
+    "budget_total":"SELECT SUM(monthly_limit) AS total FROM budgets WHERE user_id=%s",
+    #budget against this month's spend, from the rollup
+    "budget_status":"""
+        SELECT
+            b.category,
+            b.monthly_limit,
+            COALESCE(SUM(e.total),0) AS spent,
+            b.monthly_limit-COALESCE(SUM(e.total),0) AS remaining
+        FROM budgets b
+        LEFT JOIN expense_daily_totals e
+            ON b.category=e.category
+            AND e.user_id=b.user_id
+            AND e.day>=date_trunc('month',CURRENT_DATE)::date
+        WHERE b.user_id=%s
+        GROUP BY b.category,b.monthly_limit
+    """,
+
+    #per-user data version, read on every GET and bumped on every write
+    "user_data_state":"SELECT data_version,COALESCE(data_changed_at>NOW()-make_interval(secs=>%s),FALSE) AS recent_write FROM users WHERE id=%s",
+    "user_version_bump":"UPDATE users SET data_version=data_version+1,data_changed_at=NOW() WHERE id=%s RETURNING data_version"
+}
+
+async def execute(conn,name:str,params=None):
+    return await conn.execute(STATEMENTS[name],params,prepare=True)
@@ -1,24 +1,131 @@
-from fastapi import FastAPI
-from routes import auth,expenses,budgets
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import APIRouter,FastAPI,Request
+from fastapi.responses import ORJSONResponse,PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+import config
+from routes import auth,expenses,budgets,dashboard,analytics
+from database.connection import open_pool,close_pool,pool_stats,open_replicas,close_replicas,replica_stats
+from database.migrate import migrate
+from utils.passwords import start_hashing_pool,stop_hashing_pool
+from utils import metrics
+from utils.profiling import ProfilerMiddleware
+from utils import ratelimit
 
-#creating fastapi app
-app=FastAPI(
-    title="Expense Tracker",
-    description="Tracking expenses and budgets ",
-    version="1.0.0"
-)  
+logger=logging.getLogger(__name__)
 
-#including all routers
-app.include_router(auth.router)
-app.include_router(expenses.router)
-app.include_router(budgets.router)
+#startup runs these in order and shutdown undoes them in reverse: (name, start, stop)
+async def _migrate():
+    if config.MIGRATE_ON_STARTUP:
+        await run_in_threadpool(migrate) #advisory locked, safe when several workers start together
+
+async def _start_hashing():
+    start_hashing_pool()
+
+async def _stop_hashing():
+    stop_hashing_pool()
+
+RESOURCES=[
+    ("migrations",_migrate,None),
+    ("hashing pool",_start_hashing,_stop_hashing),
+    ("database pool",open_pool,close_pool), #opens DB_POOL_MIN_SIZE connections before the first request
+    ("read replicas",open_replicas,close_replicas)
+]
+
+#opening the database and password hashing pools once on startup and closing them on shutdown.
+#uvicorn only runs the shutdown half after in-flight requests finished (or --timeout-graceful-shutdown passed)
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    started=time.perf_counter()
+    opened=[]
+    try:
+        for name,start,stop in RESOURCES:
+            step=time.perf_counter()
+            await start()
+            if stop is not None:
+                opened.append((name,stop))
+            logger.info("started %s in %.1f ms",name,(time.perf_counter()-step)*1000)
+        app.state.startup_ms=round((time.perf_counter()-started)*1000,1)
+        logger.info("worker %d ready in %.1f ms",os.getpid(),app.state.startup_ms)
+        yield
+    finally:
+        for name,stop in reversed(opened):
+            try:
+                await stop()
+            except Exception:
+                logger.exception("stopping %s failed",name)
+        logger.info("worker %d stopped",os.getpid())
+
+root_router=APIRouter(tags=["Root"])
+
+#building the app, server.py hands this factory to uvicorn so every worker process makes its own
+def create_app() -> FastAPI:
+    app=FastAPI(
+        title="Expense Tracker",
+        description="Tracking expenses and budgets ",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse #orjson encodes the already-serialized content much faster than json.dumps
+    )
+    app.state.startup_ms=None
+
+    #per-user/per-IP token buckets and the cap on requests using the database at once, both answer 429 with Retry-After
+    app.add_middleware(ratelimit.RateLimitMiddleware)
+    #request count, latency and in-flight metrics for every route, served on /metrics
+    app.add_middleware(metrics.MetricsMiddleware)
+    #profiling one request on demand, only mounted when a PROFILE_TOKEN is configured
+    if config.PROFILE_TOKEN:
+        app.add_middleware(ProfilerMiddleware)
+
+    #including all routers
+    app.include_router(root_router)
+    app.include_router(auth.router)
+    app.include_router(expenses.router)
+    app.include_router(budgets.router)
+    app.include_router(dashboard.router)
+    app.include_router(analytics.router)
+    return app
 
 #root endpoint
-@app.get("/",tags=["Root"])
-def root():
+@root_router.get("/")
+async def root():
     return{
         "message":"Welcome to Expense Tracker",
         "status":"running",
         "docs":"Docs for API documentation"
 
     }
+
+#health check with connection pool metrics
+@root_router.get("/health")
+async def health(request:Request):
+    return{
+        "status":"ok",
+        "pid":os.getpid(),
+        "startup_ms":request.app.state.startup_ms,
+        "db_pool":pool_stats(),
+        "db_replicas":replica_stats(),
+        "rate_limit":ratelimit.stats(),
+        "token_cache":auth.token_cache.stats(),
+        "dashboard_cache":dashboard.dashboard_cache.stats(),
+        "analytics_cache":analytics.analytics_cache.stats()
+    }
+
+#prometheus scrape endpoint: request and query metrics plus pool and cache state (this worker only)
+@root_router.get("/metrics",response_class=PlainTextResponse)
+async def get_metrics():
+    caches={"token":auth.token_cache,"dashboard":dashboard.dashboard_cache,"analytics":analytics.analytics_cache}
+    gauges={f"db_pool_{key}":value for key,value in pool_stats().items()}
+    replicas=replica_stats()
+    if replicas:
+        gauges["db_replica_healthy"]={replica['name']:int(replica['healthy']) for replica in replicas}
+    gauges.update({f"rate_limit_{key}":value for key,value in ratelimit.stats().items() if value is not None})
+    gauges["cache_entries"]={name:len(cache) for name,cache in caches.items()}
+    gauges["cache_hits"]={name:cache.hits for name,cache in caches.items()}
+    gauges["cache_misses"]={name:cache.misses for name,cache in caches.items()}
+    return PlainTextResponse(metrics.render(gauges),media_type="text/plain; version=0.0.4")
+
+#module level app for `uvicorn main2:app` and the benchmarks
+app=create_app()
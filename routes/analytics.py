@@ -0,0 +1,49 @@
+from datetime import date
+from fastapi import APIRouter,Depends,Query
+from fastapi.concurrency import run_in_threadpool
+import config
+from utils.versions import get_read_db
+from routes.auth import get_current_user
+from utils.analytics import history_start,spending_analytics
+from utils.cache import TTLCache
+from utils.etag import data_version
+#creating router for spending analytics
+router=APIRouter(prefix="/analytics",tags=["Analytics"])
+
+#(user_id, data version, day, options) -> result, same scheme as the dashboard cache
+analytics_cache=TTLCache(maxsize=config.ANALYTICS_CACHE_SIZE,ttl=config.ANALYTICS_CACHE_TTL)
+
+#the user's daily rollup as three parallel arrays in a single row, instead of one dict per row
+ANALYTICS_SQL="""
+    SELECT
+        COALESCE(array_agg(day-DATE '1970-01-01'),'{}') AS days,
+        COALESCE(array_agg(category),'{}') AS categories,
+        COALESCE(array_agg(total::float8),'{}') AS totals
+    FROM expense_daily_totals
+    WHERE user_id=%s AND day>=%s AND count<>0
+"""
+
+@router.get("/")
+async def get_analytics(
+    months:int=Query(12,ge=1,le=120),
+    window:int=Query(3,ge=1,le=24,description="months in the rolling average"),
+    top:int=Query(5,ge=1,le=50),
+    current_user_id:int=Depends(get_current_user),
+    version:int=Depends(data_version),
+    conn=Depends(get_read_db)
+):
+    #monthly trend, rolling average, month-over-month change and category breakdown
+    today=date.today()
+    key=(current_user_id,version,today,months,window,top)
+    cached=analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    cur=await conn.execute(ANALYTICS_SQL,(current_user_id,history_start(today,months,window)))
+    row=await cur.fetchone()
+    #numpy work runs off the event loop so other requests keep being served
+    analytics=await run_in_threadpool(
+        spending_analytics,row['days'],row['categories'],row['totals'],today,months,window,top
+    )
+    analytics_cache.set(key,analytics)
+    return analytics
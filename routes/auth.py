@@ -2,12 +2,17 @@
 
 from fastapi import APIRouter,HTTPException,Depends,status # apirouter creates a group of related routes(all auth routes together). httpexception is used to return errors(email already exists).Depends checks if user is logged in. 
 from fastapi.security import HTTPBearer,HTTPAuthorizationCredentials #Bearer sends a request to fastapi(tells fastapi) to expect a token in the authorization header. Authorizationcredentials-extracts the token from the request
-import bcrypt #password hasher
 import jwt #creates and verifies json web tokens
+import hashlib
+import secrets
 from datetime import datetime,timedelta # timedelta is used to set when tokens expire
 import os # lets the environment variables to be read
-from database.connection import get_db_connection #my function to connect to database
-from schemas.user import UserRegister,UserLogin #import schemas
+from psycopg import errors
+import config
+from database.connection import get_db,pooled_connection #pooled database connection dependency
+from schemas.user import UserRegister,UserLogin,RefreshRequest #import schemas
+from utils.cache import TTLCache
+from utils.passwords import hash_password_async,verify_password_async,needs_rehash #bcrypt runs in a separate process pool
 
 
 
@@ -19,21 +24,6 @@ SECRET_KEY= os.getenv("SECRET_KEY","this-is-my-secret-key") #proves the token is
 ALGORITHM="HS256" #HS256 = HMAC SHA-256 (a secure encryption algorithm)
 ACCESS_TOKEN_EXPIRE_MINUTES=30
 
-#settingup password hashing
-def hash_password(password:str) -> str: #-> str means that the  function returns a string
-    pwd_bytes=password.encode('utf-8') #converts the password string into bytes. utf-8 is the encoding format standard for text
-    salt=bcrypt.gensalt() #salt is a random data added to the password before hashing and it makes each hash unique,even on the same password
-    return bcrypt.hashpw(pwd_bytes,salt).decode('utf-8') #bcrypt.hashpw(pwd_bytes, salt) - Hashes the password with the salt..decode('utf-8') - Converts bytes back to a string..return - Returns the hashed password string
-
-
-#verifying the password
-def verify_password(plain_password:str,hashed_password:str) -> bool:
-    #checking if a plain password matches the hashed version
-    pwd_bytes=plain_password.encode('utf-8')
-    hashed_bytes=hashed_password.encode('utf-8')
-    return bcrypt.checkpw(pwd_bytes,hashed_bytes)
-
-
 #creating access token function
 def create_access_token(user_id: int) -> str:
     #creating a jwt token for a user
@@ -52,10 +42,42 @@ def create_access_token(user_id: int) -> str:
     #part2:payload(user_id,exp),it is encoded not encrypted ..meaning anyone can read the token
     #part3:signature(proves it is authentic)
 
-#getting current user function
-def get_current_user(credentials:HTTPAuthorizationCredentials = Depends(security)):
-    #verifying jwt token and return the user_id
-    token = credentials.credentials #credentials.credentials is the token string
+#creating a refresh token: a long random string, only its sha256 is stored in the database
+async def create_refresh_token(conn,user_id:int,family_id=None) -> str:
+    #family_id links every token rotated from the same login, so reuse can revoke the whole chain
+    token=secrets.token_urlsafe(32)
+    await conn.execute(
+        "INSERT INTO refresh_tokens(user_id,token_hash,family_id,expires_at) VALUES (%s,%s,COALESCE(%s,gen_random_uuid()),NOW()+%s*INTERVAL '1 day')",
+        (user_id,_hash_refresh_token(token),family_id,config.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    await prune_refresh_tokens(conn)
+    return token
+
+#every token adds a row, so each one also deletes a batch of expired ones and the table stays
+#the size of the live logins. an expired token is refused anyway, its row is only needed for
+#reuse detection while it could still be used. SKIP LOCKED keeps concurrent logins from waiting on each other
+PRUNE_SQL="""
+    DELETE FROM refresh_tokens WHERE id IN (
+        SELECT id FROM refresh_tokens WHERE expires_at<=NOW()
+        LIMIT %s FOR UPDATE SKIP LOCKED
+    )
+"""
+
+async def prune_refresh_tokens(conn):
+    await conn.execute(PRUNE_SQL,(config.REFRESH_TOKEN_PRUNE_BATCH,))
+
+def _hash_refresh_token(token:str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+#tokens that already passed jwt.decode, keyed by their sha256 and kept until the token's exp
+token_cache=TTLCache(maxsize=config.TOKEN_CACHE_SIZE)
+
+#verifying a jwt token and returning the user_id inside it
+def decode_access_token(token:str) -> int:
+    key=hashlib.sha256(token.encode('utf-8')).digest()
+    user_id=token_cache.get(key)
+    if user_id is not None:
+        return user_id
 
     try:
         payload=jwt.decode(token,SECRET_KEY,algorithms=[ALGORITHM])
@@ -66,6 +88,7 @@ def get_current_user(credentials:HTTPAuthorizationCredentials = Depends(security
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
+        token_cache.set(key,user_id,expires_at=payload.get("exp"))
         return user_id
     
     except jwt.ExpiredSignatureError:
@@ -79,35 +102,32 @@ def get_current_user(credentials:HTTPAuthorizationCredentials = Depends(security
             detail="Invalid token"
         )
 
+#getting current user function
+async def get_current_user(credentials:HTTPAuthorizationCredentials = Depends(security)):
+    #verifying jwt token and return the user_id
+    token = credentials.credentials #credentials.credentials is the token string
+    return decode_access_token(token)
+
         
 
 
 
 #register function
 @router.post("/register")
-def register_user(user:UserRegister):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    #checking if the email already exists
-    cur.execute("SELECT id FROM users WHERE email= %s",(user.email,))
-    existing_user= cur.fetchone()
-
-    if existing_user:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    
-    #hashing the password
-    hashed_password=hash_password(user.password)
-
-    #inserting a new user
-    cur.execute("INSERT INTO users(name,email,hashed_password) VALUES (%s,%s,%s) RETURNING id,name,email",
-                (user.name,user.email,hashed_password)
-    )
-    new_user=cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+async def register_user(user:UserRegister):
+    #hashing the password first: bcrypt can wait behind other hashes, no connection is held meanwhile
+    hashed_password=await hash_password_async(user.password)
+
+    #inserting a new user, the unique email constraint tells us if the email already exists
+    async with pooled_connection() as conn:
+        try:
+            cur=await conn.execute("INSERT INTO users(name,email,hashed_password) VALUES (%s,%s,%s) RETURNING id,name,email",
+                        (user.name,user.email,hashed_password)
+            )
+        except errors.UniqueViolation:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+        new_user=await cur.fetchone()
+        await conn.commit()
 
     #returning the new user without password
     return{
@@ -115,8 +135,23 @@ def register_user(user:UserRegister):
         "user": new_user
     }
 
+#the auth queries as constants, migrate check EXPLAINs these same strings
+LOGIN_SQL="SELECT id,name,email,hashed_password FROM users WHERE email=%s"
+ME_SQL="SELECT id,name,email FROM users WHERE id=%s"
+#one indexed update both checks the token and marks it used
+REFRESH_SQL="""
+    UPDATE refresh_tokens SET revoked_at=NOW()
+    WHERE token_hash=%s AND revoked_at IS NULL AND expires_at>NOW()
+    RETURNING user_id,family_id
+"""
+#every token rotated from the same login as the given one
+REVOKE_FAMILY_SQL="""
+    UPDATE refresh_tokens SET revoked_at=NOW()
+    WHERE revoked_at IS NULL AND family_id=(SELECT family_id FROM refresh_tokens WHERE token_hash=%s)
+"""
+
 @router.post("/login")
-def login_user(user:UserLogin):
+async def login_user(user:UserLogin):
     """
     login a user and return a JWT token
     Steps:
@@ -128,45 +163,85 @@ def login_user(user:UserLogin):
     the user must send this token with future requests to prove they are logged in
 
     """
-    conn=get_db_connection()
-    cur=conn.cursor()
 
-    try:
-        #step 1: find the user by email
-        cur.execute(
-            "SELECT id,name,email,hashed_password FROM users WHERE email= %s",
-            (user.email,)
-                    
-        )
-        db_user=cur.fetchone()
+    #step 1: find the user by email. the connection goes back to the pool before bcrypt runs,
+    #so a burst of logins waiting on the hashing pool does not hold database connections
+    async with pooled_connection() as conn:
+        cur=await conn.execute(LOGIN_SQL,(user.email,))
+        db_user=await cur.fetchone()
 
-        #step2: verify password
-        if not db_user or not verify_password(user.password,db_user['hashed_password']):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid email or password"
-            )
-        
-        #step3: create JWT token
-        access_token=create_access_token(db_user['id'])
-
-        #return token and user info
-        return{
-            "access_token":access_token,
-            "token_type":"bearer",
-            "user":{
-                "id":db_user['id'],
-                "name":db_user['name'],
-                "email":db_user['email']
-            }
+    #step2: verify password
+    if not db_user or not await verify_password_async(user.password,db_user['hashed_password']):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password"
+        )
+    
+    #the hash was made with an older cost, store it again with the current BCRYPT_ROUNDS
+    new_hash=None
+    if needs_rehash(db_user['hashed_password']):
+        new_hash=await hash_password_async(user.password)
+
+    #step3: create JWT token, plus a refresh token so the client can renew it without the password
+    access_token=create_access_token(db_user['id'])
+    async with pooled_connection() as conn:
+        if new_hash:
+            await conn.execute("UPDATE users SET hashed_password=%s WHERE id=%s",(new_hash,db_user['id']))
+        refresh_token=await create_refresh_token(conn,db_user['id'])
+        await conn.commit()
+
+    #return token and user info
+    return{
+        "access_token":access_token,
+        "refresh_token":refresh_token,
+        "token_type":"bearer",
+        "user":{
+            "id":db_user['id'],
+            "name":db_user['name'],
+            "email":db_user['email']
         }
-    finally:
-        cur.close()
-        conn.close()  
+    }
+
+
+@router.post("/refresh")
+async def refresh_access_token(body:RefreshRequest,conn=Depends(get_db)):
+    """
+    swap a refresh token for a new access token and a new refresh token
+    every refresh token works once: using an old one again means it was stolen,
+    so every token from that login is revoked and the user has to login again
+    """
+    token_hash=_hash_refresh_token(body.refresh_token)
+
+    cur=await conn.execute(REFRESH_SQL,(token_hash,))
+    current=await cur.fetchone()
+
+    if not current:
+        #reuse detection: the token exists but was already rotated or revoked
+        await conn.execute(REVOKE_FAMILY_SQL,(token_hash,))
+        await conn.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token.Please login again"
+        )
+
+    refresh_token=await create_refresh_token(conn,current['user_id'],current['family_id'])
+    await conn.commit()
+    return{
+        "access_token":create_access_token(current['user_id']),
+        "refresh_token":refresh_token,
+        "token_type":"bearer"
+    }
+
+@router.post("/logout")
+async def logout_user(body:RefreshRequest,conn=Depends(get_db)):
+    #revoking the refresh token and every token rotated from the same login
+    await conn.execute(REVOKE_FAMILY_SQL,(_hash_refresh_token(body.refresh_token),))
+    await conn.commit()
+    return{"message":"Logged out successfully"}
 
 
 @router.get("/me")
-def get_current_user_info(current_user_id:int =Depends(get_current_user)):
+async def get_current_user_info(current_user_id:int =Depends(get_current_user),conn=Depends(get_db)):
     """
     Get the logged-in user's information
     This is a protected route - a valid jwt token must be sent
@@ -178,16 +253,9 @@ def get_current_user_info(current_user_id:int =Depends(get_current_user)):
     4.try this endpoint
 
     """
-    conn=get_db_connection()
-    cur=conn.cursor()
-
-    cur.execute(
-        "SELECT id,name,email  FROM users WHERE id=%s",
-        (current_user_id,)
-    )  
-    user=cur.fetchone()
-    cur.close()
-    conn.close()
+
+    cur=await conn.execute(ME_SQL,(current_user_id,))
+    user=await cur.fetchone()
 
     if not user:
         raise HTTPException(
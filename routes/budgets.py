@@ -1,92 +1,90 @@
-from fastapi import APIRouter,Depends,status
+from decimal import Decimal
+from fastapi import APIRouter,Depends,Query,status
 from fastapi import HTTPException
-from database.connection import get_db_connection
-from schemas.budget import BudgetCreate,BudgetUpdate,BudgetStatus
+from psycopg import sql
+from database.connection import get_db
+from database.statements import execute
+from schemas.budget import BudgetCreate,BudgetUpdate,BudgetStatus,BudgetOut,BudgetPage
 from routes.auth import get_current_user
+from utils.pagination import encode_cursor,decode_cursor,parse_fields
+from utils.versions import bump_user_version,get_read_db
+from utils.etag import data_version
 #creating router for budget endpoints
 router=APIRouter(prefix="/budgets",tags=["Budgets"])
 
 #Reading all budgets
-@router.get("/")
-def get_budgets(current_user_id:int =Depends(get_current_user)):
-    conn=get_db_connection()
-    cur= conn.cursor()
-    cur.execute(
-        "SELECT * FROM budgets WHERE user_id=%s ORDER BY monthly_limit DESC ",
-        (current_user_id,)
-    )
-    budgets=cur.fetchall()
-    cur.close()
-    conn.close()
-    return budgets
+#columns a client can ask for with ?fields=
+BUDGET_FIELDS=("id","user_id","category","monthly_limit","created_at")
+
+def budgets_query(user_id:int,cursor:str|None,limit:int,columns):
+    #keyset pagination on (monthly_limit,id), same scheme as GET /expenses
+    select=sql.SQL(",").join(map(sql.Identifier,dict.fromkeys(["id","monthly_limit",*columns])))
+    after=sql.SQL("")
+    params=[user_id]
+    if cursor:
+        after=sql.SQL("AND (monthly_limit,id) < (%s,%s)")
+        params.extend(decode_cursor(cursor,Decimal,int))
+    params.append(limit+1)
+    query=sql.SQL("SELECT {} FROM budgets WHERE user_id=%s {} ORDER BY monthly_limit DESC,id DESC LIMIT %s").format(select,after)
+    return query,params
+
+@router.get("/",response_model=BudgetPage,response_model_exclude_unset=True,dependencies=[Depends(data_version)])
+async def get_budgets(limit:int=Query(50,ge=1,le=200),cursor:str|None=None,fields:str|None=None,current_user_id:int =Depends(get_current_user),conn=Depends(get_read_db)):
+    columns=parse_fields(fields,BUDGET_FIELDS)
+    query,params=budgets_query(current_user_id,cursor,limit,columns)
+    cur= await conn.execute(query,params)
+    budgets=await cur.fetchall()
+    next_cursor=None
+    if len(budgets)>limit:
+        budgets=budgets[:limit]
+        next_cursor=encode_cursor(budgets[-1]['monthly_limit'],budgets[-1]['id'])
+    return{
+        "items":[{key:row[key] for key in columns} for row in budgets],
+        "next_cursor":next_cursor
+    }
 
 #creating budgets
-@router.post("/")
-def add_budget(budget:BudgetCreate,current_user_id:int =Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-
-    # Check if budget category already exists
-    cur.execute("SELECT * FROM budgets WHERE category = %s AND user_id = %s", (budget.category,current_user_id))
-    if cur.fetchone():
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Budget category already exists")
-
+@router.post("/",response_model=BudgetOut)
+async def add_budget(budget:BudgetCreate,current_user_id:int =Depends(get_current_user),conn=Depends(get_db)):
 
-    cur.execute("INSERT INTO budgets(category,monthly_limit,user_id) VALUES(%s,%s,%s) RETURNING *",
+    #the unique (user_id,category) index rejects duplicates, no separate lookup needed
+    cur=await execute(conn,"budget_insert",
          (budget.category,budget.monthly_limit,current_user_id)       
     )
-    budget = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    budget = await cur.fetchone()
+    if not budget:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Budget category already exists")
+    await bump_user_version(conn,current_user_id) #cached results and ETags for this user are now stale
+    await conn.commit()
     return budget
 
 #updating budgets
-@router.put("/{budgets_id}")
-def update_budgets(budgets_id:int,budget:BudgetUpdate,current_user_id:int=Depends(get_current_user)):
-    conn= get_db_connection()
-    cur=conn.cursor()
+@router.put("/{budgets_id}",response_model=BudgetOut)
+async def update_budgets(budgets_id:int,budget:BudgetUpdate,current_user_id:int=Depends(get_current_user),conn=Depends(get_db)):
    
-    #only update fields that are provided
-    update_data=budget.dict(exclude_unset=True)
+    #only update fields that are provided, the prepared UPDATE keeps every column passed as None
+    fields=budget.model_dump()
    
-    if not update_data:
+    if all(value is None for value in fields.values()):
       raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="No fields to update")
 
-
-    #build dynamic sql query
-    set_clause =",".join([f"{key}=%s" for key in update_data.keys()])
-    values=list(update_data.values())
-    values.extend([budgets_id,current_user_id])
-   
-   
-   
-   
-   
-    cur.execute(f"UPDATE budgets SET {set_clause} WHERE id= %s AND user_id = %s RETURNING *",
-               values
-    )
-    updated=cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    cur=await execute(conn,"budget_update",{**fields,"id":budgets_id,"user_id":current_user_id})
+    updated=await cur.fetchone()
 
     if updated:
+        await bump_user_version(conn,current_user_id)
+        await conn.commit()
         return updated
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Budget not found")
 
 #deleting budgets
 @router.delete("/{budgets_id}")
-def delete_budgets(budgets_id:int,current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute("DELETE FROM budgets WHERE  id = %s  AND user_id = %s RETURNING *",(budgets_id,current_user_id))
-    deleted=cur.fetchone()
-    conn.commit()
-    cur.close()
+async def delete_budgets(budgets_id:int,current_user_id:int=Depends(get_current_user),conn=Depends(get_db)):
+    cur=await execute(conn,"budget_delete",(budgets_id,current_user_id))
+    deleted=await cur.fetchone()
     if deleted:
+        await bump_user_version(conn,current_user_id)
+        await conn.commit()
         return{"message": "Budget deleted successfully"}
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -95,44 +93,19 @@ def delete_budgets(budgets_id:int,current_user_id:int=Depends(get_current_user))
 
 
 #getting the totals of budgets
-@router.get("/total")
-def get_totalbudgets(current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute(
-        "SELECT SUM(monthly_limit) as total FROM budgets WHERE user_id= %s",
-    (current_user_id,)    
-    )
-    result=cur.fetchone()
-    cur.close()
-    conn.close()
+@router.get("/total",dependencies=[Depends(data_version)])
+async def get_totalbudgets(current_user_id:int=Depends(get_current_user),conn=Depends(get_read_db)):
+    cur=await execute(conn,"budget_total",(current_user_id,))
+    result=await cur.fetchone()
 
     return{"total": result['total'] or 0}
 #comparison between budget and the actual spend
-@router.get("/status", response_model=list[BudgetStatus])
-def get_budget_status(current_user_id: int = Depends(get_current_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
+@router.get("/status", response_model=list[BudgetStatus],dependencies=[Depends(data_version)])
+async def get_budget_status(current_user_id: int = Depends(get_current_user),conn=Depends(get_read_db)):
     
-    cur.execute("""
-        SELECT
-            b.category,
-            b.monthly_limit,
-            COALESCE(SUM(e.amount), 0) as spent,
-            b.monthly_limit - COALESCE(SUM(e.amount), 0) AS remaining
-        FROM budgets b
-        LEFT JOIN expenses e
-            ON b.category = e.category
-            AND e.user_id = %s
-            AND e.date >= date_trunc('month', CURRENT_DATE)
-        WHERE b.user_id = %s
-        GROUP BY b.category, b.monthly_limit                
-    """, (current_user_id, current_user_id))
-       # Passing current_user_id TWICE (once for expenses, once for budgets)
+    cur = await execute(conn,"budget_status",(current_user_id,))
     
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
+    results = await cur.fetchall()
 
     # Adding over_budget flag
     status = []
@@ -0,0 +1,63 @@
+from datetime import date
+from fastapi import APIRouter,Depends
+import config
+from utils.versions import get_read_db
+from routes.auth import get_current_user
+from utils.cache import TTLCache
+from utils.etag import data_version
+#creating router for the dashboard endpoint
+router=APIRouter(prefix="/dashboard",tags=["Dashboard"])
+
+#(user_id, data version, day) -> result. the day is part of the key because the summaries move at midnight,
+#entries from older versions are never hit again and age out of the LRU
+dashboard_cache=TTLCache(maxsize=config.DASHBOARD_CACHE_SIZE,ttl=config.DASHBOARD_CACHE_TTL)
+
+#everything the dashboard page shows, in one statement over the rollup and budgets tables
+DASHBOARD_SQL="""
+    WITH totals AS (
+        SELECT
+            COALESCE(SUM(total),0) AS total,
+            COALESCE(SUM(total) FILTER (WHERE day=CURRENT_DATE),0) AS today,
+            COALESCE(SUM(total) FILTER (WHERE day>=CURRENT_DATE-7),0) AS weekly,
+            COALESCE(SUM(total) FILTER (WHERE day>=date_trunc('month',CURRENT_DATE)::date),0) AS monthly
+        FROM expense_daily_totals
+        WHERE user_id=%(user_id)s
+    ),
+    month_spent AS (
+        SELECT category,SUM(total) AS spent
+        FROM expense_daily_totals
+        WHERE user_id=%(user_id)s AND day>=date_trunc('month',CURRENT_DATE)::date
+        GROUP BY category
+    ),
+    status AS (
+        SELECT b.category,b.monthly_limit,COALESCE(m.spent,0) AS spent
+        FROM budgets b
+        LEFT JOIN month_spent m ON m.category=b.category
+        WHERE b.user_id=%(user_id)s
+    )
+    SELECT
+        totals.*,
+        (SELECT COALESCE(SUM(monthly_limit),0) FROM status) AS budgets_total,
+        (SELECT COALESCE(json_agg(json_build_object(
+            'category',category,
+            'limit',monthly_limit,
+            'spent',spent,
+            'remaining',monthly_limit-spent,
+            'over_budget',monthly_limit-spent<0
+        ) ORDER BY category),'[]') FROM status) AS budget_status
+    FROM totals
+"""
+
+@router.get("/")
+async def get_dashboard(current_user_id:int=Depends(get_current_user),version:int=Depends(data_version),conn=Depends(get_read_db)):
+    #totals, today/weekly/monthly, budget total and budget status in one call.
+    #repeat loads are served from memory until the user writes something
+    key=(current_user_id,version,date.today())
+    cached=dashboard_cache.get(key)
+    if cached is not None:
+        return cached
+
+    cur=await conn.execute(DASHBOARD_SQL,{"user_id":current_user_id})
+    dashboard=await cur.fetchone()
+    dashboard_cache.set(key,dashboard)
+    return dashboard
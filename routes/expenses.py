@@ -1,74 +1,375 @@
-from fastapi import APIRouter,Depends,status
+import csv
+import io
+import json
+from datetime import date,datetime
+from decimal import Decimal
+from typing import Literal
+from fastapi import APIRouter,Depends,Query,Request,status
 from fastapi import HTTPException
-from database.connection import get_db_connection
-from schemas.expense import ExpenseCreate,ExpenseUpdate
+from fastapi.responses import StreamingResponse
+from psycopg import sql
+from pydantic import ValidationError
+import config
+from database.connection import get_db,checkout,checkin,pooled_connection
+from database.statements import execute
+from database.rollup import apply_rollup
+from schemas.expense import ExpenseCreate,ExpenseUpdate,ExpenseOut,ExpensePage,ExpenseBatch,ExpenseSearchPage
 from routes.auth import get_current_user  #import the auth dependancies
+from utils.pagination import encode_cursor,decode_cursor,parse_fields
+from utils.versions import bump_user_version,get_read_db
+from utils.etag import data_version
 #creating a router for expense endpoints
 router =APIRouter(prefix="/expenses",tags=["Expenses"])
 
 #   creating expenses
-@router.post("/")
-def add_expense(expense:ExpenseCreate,current_user_id:int =Depends(get_current_user)):
+@router.post("/",response_model=ExpenseOut)
+async def add_expense(expense:ExpenseCreate,current_user_id:int =Depends(get_current_user),conn=Depends(get_db)):
     #creating a new expense for a logged in user,that is the expense will be linked to the current_user_id automatically
     
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute("INSERT INTO expenses(description,amount,category,date,user_id) VALUES(%s,%s,%s,%s,%s) RETURNING *",
+    cur=await execute(conn,"expense_insert",
             (expense.description,expense.amount,expense.category,expense.date,current_user_id)    
     )
-    expense= cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    expense= await cur.fetchone()
+    await apply_rollup(conn,current_user_id,added=[expense]) #same transaction as the insert
+    await bump_user_version(conn,current_user_id) #cached results and ETags for this user are now stale
+    await conn.commit()
     return expense
 
+#adding many expenses in one request (bank sync)
+async def insert_expenses_bulk(conn,user_id:int,expenses:list) -> list:
+    #one statement for the whole batch: the rows travel as four arrays instead of one INSERT each
+    cur=await execute(conn,"expense_insert_bulk",(
+        user_id,
+        [e.description for e in expenses],
+        [e.amount for e in expenses],
+        [e.category for e in expenses],
+        [e.date for e in expenses]
+    ))
+    rows=await cur.fetchall()
+    await apply_rollup(conn,user_id,added=rows)
+    return [row['id'] for row in rows]
+
+def _parse_bulk_body(body:bytes,content_type:str):
+    #accepting either a JSON array or NDJSON (one expense per line). returns the items and
+    #{index: errors} for NDJSON lines that are not JSON, those fail alone instead of the batch
+    if "ndjson" in content_type:
+        items,invalid=[],{}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                invalid[len(items)]=[{"type":"json_invalid","loc":(),"msg":f"Invalid JSON: {e}","input":line.decode("utf-8","replace")}]
+                items.append(None)
+        return items,invalid
+    try:
+        items=json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items,list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Body must be a JSON array or NDJSON")
+    return items,{}
+
+def validate_bulk(items:list,invalid=None):
+    #the whole batch goes through pydantic-core in one call. only when something is
+    #invalid are the errors grouped per item and the remaining items validated again.
+    #invalid holds {index: errors} for items that failed before validation (malformed NDJSON lines)
+    by_index=dict(invalid or {})
+    positions=[index for index in range(len(items)) if index not in by_index]
+    try:
+        valid=ExpenseBatch.validate_python([items[index] for index in positions])
+    except ValidationError as e:
+        for error in e.errors(include_url=False,include_context=False):
+            position,*loc=error['loc']
+            by_index.setdefault(positions[position],[]).append({**error,"loc":tuple(loc)})
+        valid=ExpenseBatch.validate_python([item for index,item in enumerate(items) if index not in by_index])
+    errors=[{"index":index,"errors":by_index[index]} for index in sorted(by_index)]
+    return valid,errors
+
+async def _read_bulk_body(request:Request) -> bytes:
+    #the upload is capped before it is held in memory: a declared Content-Length over the limit
+    #is refused without reading anything, a chunked upload as soon as it passes the limit
+    too_large=HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,detail=f"Body larger than {config.BULK_MAX_BYTES} bytes")
+    length=request.headers.get("content-length","")
+    if length.isdigit() and int(length)>config.BULK_MAX_BYTES:
+        raise too_large
+    chunks,size=[],0
+    async for chunk in request.stream():
+        size+=len(chunk)
+        if size>config.BULK_MAX_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@router.post("/bulk")
+async def add_expenses_bulk(request:Request,current_user_id:int=Depends(get_current_user)):
+    #no connection is held while the body uploads and the batch is parsed and validated,
+    #one is checked out only for the insert
+    items,invalid=_parse_bulk_body(await _read_bulk_body(request),request.headers.get("content-type",""))
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="No expenses to add")
+    if len(items)>config.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,detail=f"At most {config.BULK_MAX_ITEMS} expenses per request")
+
+    valid,errors=validate_bulk(items,invalid)
+
+    ids=[]
+    if valid:
+        async with pooled_connection() as conn:
+            ids=await insert_expenses_bulk(conn,current_user_id,valid)
+            await bump_user_version(conn,current_user_id)
+            await conn.commit()
+    return{
+        "inserted":len(ids),
+        "ids":ids,
+        "errors":errors
+    }
+
+#filters shared by GET /expenses and GET /expenses/export
+#every condition is parameterized and sits next to user_id, so (user_id,date,id) or (user_id,category,date) serves it
+def expense_filters(
+    from_date:date|None=Query(None,alias="from"),
+    to_date:date|None=Query(None,alias="to"),
+    category:list[str]|None=Query(None,description="repeat for several categories"),
+    min_amount:Decimal|None=Query(None,ge=0),
+    max_amount:Decimal|None=Query(None,ge=0)
+):
+    if from_date and to_date and from_date>to_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="from must not be after to")
+    if min_amount is not None and max_amount is not None and min_amount>max_amount:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="min_amount must not be above max_amount")
+
+    conditions=[]
+    params=[]
+    if from_date:
+        conditions.append(sql.SQL("date>=%s"))
+        params.append(from_date)
+    if to_date:
+        conditions.append(sql.SQL("date<=%s"))
+        params.append(to_date)
+    if category:
+        conditions.append(sql.SQL("category=ANY(%s)"))
+        params.append(list(dict.fromkeys(category)))
+    if min_amount is not None:
+        conditions.append(sql.SQL("amount>=%s"))
+        params.append(min_amount)
+    if max_amount is not None:
+        conditions.append(sql.SQL("amount<=%s"))
+        params.append(max_amount)
+    return conditions,params
+
 #reading expenses
-@router.get("/")
-def get_expenses(current_user_id:int =Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute(
-        "SELECT * FROM expenses WHERE user_id =%s ORDER BY date DESC",
-        (current_user_id,)
+#columns a client can ask for with ?fields=
+EXPENSE_FIELDS=("id","user_id","description","amount","category","date","created_at")
+
+def expenses_query(user_id:int,filters,cursor:str|None,limit:int,columns):
+    #keyset pagination on (date,id): every page is one index range scan, however deep the client pages.
+    #migrate check EXPLAINs the query built here
+    select=sql.SQL(",").join(map(sql.Identifier,dict.fromkeys(["id","date",*columns])))
+    conditions,filter_params=filters
+    conditions=[sql.SQL("user_id=%s"),*conditions]
+    params=[user_id,*filter_params]
+    if cursor:
+        conditions.append(sql.SQL("(date,id) < (%s,%s)"))
+        params.extend(decode_cursor(cursor,date.fromisoformat,int))
+    params.append(limit+1) #one extra row tells us whether there is a next page
+    query=sql.SQL("SELECT {} FROM expenses WHERE {} ORDER BY date DESC,id DESC LIMIT %s").format(select,sql.SQL(" AND ").join(conditions))
+    return query,params
+
+#response_model lets pydantic-core serialize the page in one pass instead of jsonable_encoder walking every row
+@router.get("/",response_model=ExpensePage,response_model_exclude_unset=True,dependencies=[Depends(data_version)])
+async def get_expenses(limit:int=Query(50,ge=1,le=200),cursor:str|None=None,fields:str|None=None,filters=Depends(expense_filters),current_user_id:int =Depends(get_current_user),conn=Depends(get_read_db)):
+    columns=parse_fields(fields,EXPENSE_FIELDS)
+    query,params=expenses_query(current_user_id,filters,cursor,limit,columns)
+    cur=await conn.execute(query,params)
+
+    expenses=await cur.fetchall()
+    next_cursor=None
+    if len(expenses)>limit:
+        expenses=expenses[:limit]
+        next_cursor=encode_cursor(expenses[-1]['date'],expenses[-1]['id'])
+    return{
+        "items":[{key:row[key] for key in columns} for row in expenses],
+        "next_cursor":next_cursor
+    }
+
+#searching descriptions: full-text match on expenses.search (GIN), plus trigram word similarity
+#for typos when pg_trgm is installed. the newest SEARCH_MAX_CANDIDATES matches are ranked by
+#score, then newest first. a word that is in most of a 1M-row history would otherwise mean scoring
+#every one of those rows, this way it is a short walk down (user_id,date,id) instead
+SEARCH_COLUMNS=("id","user_id","description","amount","category","date","created_at")
+#pg_trgm is optional (migration 0006), looked up once per process
+_trigram=None
+
+async def _trigram_available(conn) -> bool:
+    global _trigram
+    if _trigram is None:
+        cur=await conn.execute("SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname='pg_trgm') AS installed")
+        _trigram=(await cur.fetchone())['installed']
+    return _trigram
+
+def search_query(user_id:int,q:str,filters,cursor:str|None,limit:int,trigram:bool):
+    #(query, params) for one page of search results, shared with benchmarks/search.py
+    conditions,filter_params=filters
+    if trigram:
+        #<% is the index-backed form of word_similarity(q,description)>=pg_trgm.word_similarity_threshold
+        match=sql.SQL("(search @@ query OR %s <%% description)")
+        score=sql.SQL("ts_rank_cd(search,query,2)+word_similarity(%s,description)")
+        params=[q,q,user_id,q]
+    else:
+        match=sql.SQL("search @@ query")
+        score=sql.SQL("ts_rank_cd(search,query,2)") #2: divided by the length, so "uber ride" beats "uber ride to the airport"
+        params=[q,user_id]
+    params.extend(filter_params)
+    params.append(config.SEARCH_MAX_CANDIDATES)
+
+    after=sql.SQL("")
+    if cursor:
+        after=sql.SQL("WHERE (score,id) < (%s,%s)")
+        params.extend(decode_cursor(cursor,float,int))
+    params.append(limit+1)
+
+    #the score is float8 so it survives the round trip through the cursor exactly
+    query=sql.SQL("""
+        SELECT * FROM (
+            SELECT {columns},({score})::float8 AS score
+            FROM (
+                SELECT {columns},search,query
+                FROM expenses,websearch_to_tsquery('english',%s) AS query
+                WHERE user_id=%s AND {match}{filters}
+                ORDER BY date DESC,id DESC
+                LIMIT %s
+            ) AS newest
+        ) AS hits
+        {after}
+        ORDER BY score DESC,id DESC
+        LIMIT %s
+    """).format(
+        columns=sql.SQL(",").join(map(sql.Identifier,SEARCH_COLUMNS)),
+        score=score,
+        match=match,
+        filters=sql.SQL("").join(sql.SQL(" AND ")+c for c in conditions),
+        after=after
     )
+    return query,params
 
-    expenses=cur.fetchall()
-    cur.close()
-    conn.close()
-    return expenses
+@router.get("/search",response_model=ExpenseSearchPage,dependencies=[Depends(data_version)])
+async def search_expenses(q:str=Query(...,min_length=1,max_length=200),limit:int=Query(50,ge=1,le=200),cursor:str|None=None,filters=Depends(expense_filters),current_user_id:int=Depends(get_current_user),conn=Depends(get_read_db)):
+    q=q.strip()
+    if not q:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="q must not be blank")
+
+    trigram=await _trigram_available(conn)
+    if trigram:
+        #the typo threshold is a setting, only for this transaction
+        await conn.execute("SELECT set_config('pg_trgm.word_similarity_threshold',%s,true)",(str(config.SEARCH_SIMILARITY),))
+    query,params=search_query(current_user_id,q,filters,cursor,limit,trigram)
+    cur=await conn.execute(query,params)
+    hits=await cur.fetchall()
+    next_cursor=None
+    if len(hits)>limit:
+        hits=hits[:limit]
+        next_cursor=encode_cursor(hits[-1]['score'],hits[-1]['id'])
+    return{"items":hits,"next_cursor":next_cursor}
 
 #getting the totals of expenses
-@router.get("/total")
-def get_totalexpenses(current_user_id:int =Depends(get_current_user)):
-    conn= get_db_connection()
-    cur= conn.cursor()
-    cur.execute(
-        "SELECT SUM(amount) as total FROM expenses WHERE user_id=%s",
-        (current_user_id,)
-    )
-    result=cur.fetchone()
-    cur.close()
-    conn.close()
+@router.get("/total",dependencies=[Depends(data_version)])
+async def get_totalexpenses(current_user_id:int =Depends(get_current_user),conn=Depends(get_read_db)):
+    cur= await execute(conn,"expense_total",(current_user_id,))
+    result=await cur.fetchone()
 
     return{"total": result['total'] or 0}
 
+#exporting the full history as a download
+EXPORT_COLUMNS=("id","date","description","category","amount","created_at")
+
+def _json_default(value):
+    if isinstance(value,Decimal):
+        return float(value)
+    if isinstance(value,(date,datetime)):
+        return value.isoformat()
+    return str(value)
+
+def _csv_chunk(rows,header=False):
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([row[key] for key in EXPORT_COLUMNS] for row in rows)
+    return buffer.getvalue()
+
+def _ndjson_chunk(rows):
+    return "".join(json.dumps({key:row[key] for key in EXPORT_COLUMNS},default=_json_default)+"\n" for row in rows)
+
+async def _stream_expenses(conn,cur,format):
+    #the named cursor keeps the result set on the server, we pull EXPORT_BATCH_SIZE rows at a time
+    #so memory stays flat no matter how many rows the user has. the generator owns the connection
+    #and returns it when the export finishes, fails or the client goes away
+    try:
+        rows=await cur.fetchmany(config.EXPORT_BATCH_SIZE)
+        yield _csv_chunk(rows,header=True) if format=="csv" else _ndjson_chunk(rows)
+        while rows:
+            rows=await cur.fetchmany(config.EXPORT_BATCH_SIZE)
+            if rows:
+                yield _csv_chunk(rows) if format=="csv" else _ndjson_chunk(rows)
+    finally:
+        try:
+            await cur.close()
+        finally:
+            await checkin(conn)
+
+async def _send_chunks(first,chunks):
+    try:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+def export_query(user_id:int,filters):
+    conditions,filter_params=filters
+    conditions=[sql.SQL("user_id=%s"),*conditions]
+    query=sql.SQL("SELECT {} FROM expenses WHERE {} ORDER BY date,id").format(
+        sql.SQL(",").join(map(sql.Identifier,EXPORT_COLUMNS)),
+        sql.SQL(" AND ").join(conditions)
+    )
+    return query,[user_id,*filter_params]
+
+@router.get("/export")
+async def export_expenses(format:Literal["csv","ndjson"]="csv",filters=Depends(expense_filters),current_user_id:int=Depends(get_current_user)):
+    query,params=export_query(current_user_id,filters)
+
+    #the checkout, the query and the first batch happen before StreamingResponse sends its 200,
+    #so a busy pool (503) or a failing query is answered as such instead of as a cut-off download
+    conn=await checkout()
+    try:
+        cur=conn.cursor(name="expenses_export")
+        await cur.execute(query,params)
+    except BaseException:
+        await checkin(conn)
+        raise
+    chunks=_stream_expenses(conn,cur,format)
+    first=await anext(chunks)
+
+    media_type="text/csv" if format=="csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _send_chunks(first,chunks),
+        media_type=media_type,
+        headers={"Content-Disposition":f'attachment; filename="expenses.{format}"'}
+    )
+
 #deleting expenses
 @router.delete("/{expenses_id}")
-def delete_expenses(expenses_id:int,current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
+async def delete_expenses(expenses_id:int,current_user_id:int=Depends(get_current_user),conn=Depends(get_db)):
 
     #deletes only if it belongs to the user
-    cur.execute(
-        "DELETE FROM expenses WHERE id = %s AND user_id=%s RETURNING *",
-        (expenses_id,current_user_id)
-        
-    )
-    deleted=cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    cur=await execute(conn,"expense_delete",(expenses_id,current_user_id))
+    deleted=await cur.fetchone()
     if deleted:
+        await apply_rollup(conn,current_user_id,removed=[deleted])
+        await bump_user_version(conn,current_user_id)
+        await conn.commit()
         return{"message": "Expense deleted successfully"}
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -76,82 +377,49 @@ def delete_expenses(expenses_id:int,current_user_id:int=Depends(get_current_user
     )
 
 #updating expenses
-@router.put("/{expenses_id}")
-def update_expenses(expenses_id:int,expense:ExpenseUpdate,current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
+@router.put("/{expenses_id}",response_model=ExpenseOut)
+async def update_expenses(expenses_id:int,expense:ExpenseUpdate,current_user_id:int=Depends(get_current_user),conn=Depends(get_db)):
     
-    #only update fields that are provided
-    update_data=expense.dict(exclude_unset=True)
+    #only update fields that are provided, the prepared UPDATE keeps every column passed as None
+    fields=expense.model_dump()
     
-    if not update_data:
+    if all(value is None for value in fields.values()):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
-    
-    #build dynamic SQL query
-    set_clause = "," .join([f"{key} =%s" for key in update_data.keys()])
-    values=list(update_data.values())
-    values.extend([expenses_id,current_user_id])
 
+    #the old row is locked first so the rollup can move its amount from the old day/category to the new one
+    cur=await execute(conn,"expense_lock",(expenses_id,current_user_id))
+    previous=await cur.fetchone()
+    if not previous:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
 
-    cur.execute( f"UPDATE expenses SET {set_clause} WHERE id= %s AND user_id = %s RETURNING *",
-         values
-    )
+    cur=await execute(conn,"expense_update",{**fields,"id":expenses_id,"user_id":current_user_id})
    
-    updated=cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    if updated:
-        return updated
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    updated=await cur.fetchone()
+    await apply_rollup(conn,current_user_id,added=[updated],removed=[previous])
+    await bump_user_version(conn,current_user_id)
+    await conn.commit()
+    return updated
 
 #Daily expenses summary
-@router.get("/summary/today")
-def get_today_total(current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur= conn.cursor()
-    cur.execute("""
-        SELECT SUM(amount) as total
-        FROM expenses
-        WHERE date= CURRENT_DATE  AND user_id=%s     
-    """,(current_user_id,))
-    result=cur.fetchone()
-    cur.close()
-    conn.close()
+@router.get("/summary/today",dependencies=[Depends(data_version)])
+async def get_today_total(current_user_id:int=Depends(get_current_user),conn=Depends(get_read_db)):
+    cur= await execute(conn,"expense_today",(current_user_id,))
+    result=await cur.fetchone()
     return{"period":"today", "total":result['total'] or 0}
 
 #weekly expenses summary
-@router.get("/summary/weekly")
-def get_weekly_total(current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute("""
-        SELECT SUM(amount) as weekly_total
-        FROM expenses
-        WHERE date >= CURRENT_DATE - INTERVAL'7 days' 
-        AND user_id= %s                     
-    """, (current_user_id,))
-    result=cur.fetchone()
-    cur.close()
-    conn.close()
+@router.get("/summary/weekly",dependencies=[Depends(data_version)])
+async def get_weekly_total(current_user_id:int=Depends(get_current_user),conn=Depends(get_read_db)):
+    cur=await execute(conn,"expense_weekly",(current_user_id,))
+    result=await cur.fetchone()
     return{"period":"weekly", "weekly_total":result['weekly_total'] or 0}
 
 
 #monthly summary expenses
-@router.get("/summary/monthly")
-def get_monthly_total(current_user_id:int=Depends(get_current_user)):
-    conn=get_db_connection()
-    cur=conn.cursor()
-    cur.execute("""
-        SELECT SUM(amount) AS monthly_total
-        FROM  expenses
-        WHERE date >=date_trunc('month',CURRENT_DATE)  
-        AND user_id =%s                    
-                               
-    """,(current_user_id,))
-    result=cur.fetchone()
-    cur.close()
-    conn.close()
+@router.get("/summary/monthly",dependencies=[Depends(data_version)])
+async def get_monthly_total(current_user_id:int=Depends(get_current_user),conn=Depends(get_read_db)):
+    cur=await execute(conn,"expense_monthly",(current_user_id,))
+    result=await cur.fetchone()
     return{"period":"monthly","total":result['monthly_total'] or 0}
 
 
@@ -1,48 +1,28 @@
-from pydantic import BaseModel, Field, validator
-import re
-from datetime import date
+from datetime import datetime
+from pydantic import BaseModel
+from schemas.fields import Money,Category
+
 class BudgetCreate(BaseModel):
-    category:str =Field(...,min_length=1,max_length=50)
-    monthly_limit:float = Field(...,gt=0)
-   
-    @validator('category')
-    def category_not_empty(cls,v):
-        #category cannot be just spaces and allows underscores
-        if not v.strip():
-            raise ValueError('Category cannot be empty')
-        #allow letters,spsces, numbers and underscore
-        if not re.match(r'^[a-zA-Z0-9_]+$',v):
-            raise ValueError('Category can only contain letters,numbers,spaces and underscore')
-        return v.strip()
-    @validator('monthly_limit')
-    def limit_two_decimals(cls,v):
-        if round(v,2) !=v:
-            raise ValueError('Monthly limit can only have up to 2 decimal place')
-        return round(v,2)
-    
+    category:Category
+    monthly_limit:Money
+
 
 class BudgetUpdate(BaseModel):
-    category:str=Field(None,min_length=1,max_length=50)
-    monthly_limit:float=Field(None,gt=0)
-
-    @validator('category')
-    def validate_category(cls,v):
-        if v is not None:
-            if not v.strip():
-                raise ValueError('Category cannot be updated')
-            if not re.match(r'^[a-zA-Z0-9_]+$',v):
-                raise ValueError('Category can only contain letters, numbers,spaces and underscores')
-            return v.strip()
-        return v
-    
-    @validator('monthly_limit')
-    def validate_monthly_limit(cls,v):
-        if v is not None:
-            if round(v,2) !=v:
-                raise ValueError('Monthly limit can only have up to 2 decimal places')
-            return round(v,2)
-        return v
-    
+    category:Category|None=None
+    monthly_limit:Money|None=None
+
+#response models, optional columns for the same reason as ExpenseOut
+class BudgetOut(BaseModel):
+    id:int|None=None
+    user_id:int|None=None
+    category:str|None=None
+    monthly_limit:float|None=None
+    created_at:datetime|None=None
+
+class BudgetPage(BaseModel):
+    items:list[BudgetOut]
+    next_cursor:str|None=None
+
 class BudgetStatus(BaseModel):
     category:str
     limit:float
@@ -1,98 +1,45 @@
-from pydantic import BaseModel,Field,validator
-import re
-from datetime import datetime
+from datetime import datetime,date as date_type
+from pydantic import BaseModel,TypeAdapter
+from schemas.fields import Money,Category,Description,ExpenseDate
 
 class ExpenseCreate(BaseModel):
-    description:str =Field(...,min_length=1,max_length=200)
-    amount:float=Field(...,gt=0) #gt=greater than 0
-    category:str=Field(...,min_length=1,max_length=50)
-    date:str
-
-    @validator('description')
-    def description_not_empty(cls,v):
-        #description cannot be just spaces
-        if not v.strip():
-            raise ValueError('Description cannot be empty')
-        return v.strip()
-        
-    @validator('amount')
-    def amount_has_max_two_decimals(cls,v):
-        if round(v,2) != v:
-           raise ValueError('Amount can only have up to 2 decimal places')
-        return round(v,2)
-    
-    @validator('category')
-    def validate_category(cls,v):
-        #category cannot be just spaces and allows underscores 
-        if not v.strip():
-            raise ValueError('Category cannot be empty') 
-        #allow letters,numbers,spaces and underscores
-        if not re.match(r'^[a-zA-Z0-9_]+$',v):
-            raise ValueError('Category can only contain letters,numbers,spaces, and underscores')
-        return v.strip()
-    
-
-    @validator('date')
-    def validate_date_format(cls,v):
-        #the date format is DD-MM-YYYY
-        try:
-            #parsing the date in DD-MM-YYYY
-            parsed_date=datetime.strptime(v,'%d-%m-%Y')
-            return v
-        except ValueError:
-            raise ValueError('Date must be in DD-MM-YYYY format(e.g.,15-02-2003)')
+    description:Description
+    amount:Money
+    category:Category
+    date:ExpenseDate #DD-MM-YYYY or YYYY-MM-DD
 
 
 class ExpenseUpdate(BaseModel):
-    #all fields are optional, user might only want to update one fiels
-    description:str = Field(None,min_length=1,max_length=200)
-    amount:float=Field(None,gt=0)
-    category:str=Field(None,min_length=1,max_length=50)
-    date:str= None
-
-    @validator('description')
-    def description_not_empty(cls,v):
-        #description cannot be just spaces
-        if v is not None:
-            if not v.strip():
-                raise ValueError('Description cannot be empty')
-            return v.strip()
-        return v
-    
-    @validator('amount')
-    def amount_has_max_two_decimals(cls,v):
-        if v is not None:
-            if round(v,2) !=v:
-                raise ValueError('Amount can only have up to 2 decimal places')
-            return round(v,2)
-        return v
-    
-    @validator('category')
-    def validate_category(cls,v):
-        if v is not None:
-            if not v.strip():
-                raise ValueError('Category cannot be empty')
-            #allowing letters,numbers,spaces and underscores
-            if not re.match(r'^[a-zA-Z0-9_]+$',v):
-                raise ValueError('Category can only contain letters, numbers,spaces and underscores')
-            return v.strip()
-        return v
-    
-
-    @validator('date')
-    def validate_date_format(cls,v):
-        if v is not None:
-            try:
-
-                #parse the date in DD-MM-YYYY Format
-                datetime.strptime(v,'%d-%m-%Y')
-                return v
-            except ValueError:
-                raise ValueError('Date must be in DD-MM-YYYY format (e.r., 15-02-2003)')
-        return v
-        
-        
-    
-
-
-    
+    #all fields are optional, user might only want to update one field
+    description:Description|None=None
+    amount:Money|None=None
+    category:Category|None=None
+    date:ExpenseDate|None=None
+
+
+#validates a whole batch in one pydantic-core call (POST /expenses/bulk)
+ExpenseBatch=TypeAdapter(list[ExpenseCreate])
+
+
+#response models. every column is optional because ?fields= can ask for a subset,
+#routes use response_model_exclude_unset so columns that were not asked for stay out
+class ExpenseOut(BaseModel):
+    id:int|None=None
+    user_id:int|None=None
+    description:str|None=None
+    amount:float|None=None
+    category:str|None=None
+    date:date_type|None=None
+    created_at:datetime|None=None
+
+class ExpensePage(BaseModel):
+    items:list[ExpenseOut]
+    next_cursor:str|None=None
+
+#GET /expenses/search: every column plus how well the row matched
+class ExpenseSearchHit(ExpenseOut):
+    score:float
+
+class ExpenseSearchPage(BaseModel):
+    items:list[ExpenseSearchHit]
+    next_cursor:str|None=None
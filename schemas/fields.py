@@ -0,0 +1,66 @@
+#field types shared by the request schemas. the checks live here once instead of
+#being repeated as validators on every Create/Update model
+import re
+from datetime import date
+from decimal import Decimal
+from typing import Annotated
+from pydantic import AfterValidator,BeforeValidator,Field
+
+CATEGORY_PATTERN=re.compile(r'[a-zA-Z0-9_]+') #letters, numbers and underscores
+DMY_PATTERN=re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})') #DD-MM-YYYY, day and month may be one digit
+ISO_PATTERN=re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})') #YYYY-MM-DD
+MONEY_LIMIT=Decimal(10)**8 #NUMERIC(10,2) holds up to 99999999.99
+
+def not_blank(message):
+    #text cannot be just spaces, surrounding spaces are removed
+    def check(v:str) -> str:
+        v=v.strip()
+        if not v:
+            raise ValueError(message)
+        return v
+    return check
+
+def check_category(v:str) -> str:
+    v=v.strip()
+    if not v:
+        raise ValueError('Category cannot be empty')
+    if not CATEGORY_PATTERN.fullmatch(v):
+        raise ValueError('Category can only contain letters, numbers and underscores')
+    return v
+
+def parse_expense_date(v):
+    #DD-MM-YYYY or YYYY-MM-DD (as strptime took them, single digit day and month too) into a date,
+    #stored and compared as a real DATE. anything else, numbers included, is refused here
+    #instead of reaching pydantic's lax date parsing, and errors show the input as sent
+    if isinstance(v,date):
+        return v
+    if isinstance(v,str):
+        v=v.strip()
+        match=DMY_PATTERN.fullmatch(v)
+        if match:
+            day,month,year=match.groups()
+        else:
+            match=ISO_PATTERN.fullmatch(v)
+            if match:
+                year,month,day=match.groups()
+        if match:
+            try:
+                return date(int(year),int(month),int(day))
+            except ValueError:
+                pass
+    raise ValueError('Date must be in DD-MM-YYYY or YYYY-MM-DD format(e.g.,15-02-2003)')
+
+def check_money(v:Decimal) -> Decimal:
+    #an exponent below -2 can still be a whole number of cents (e.g. "1.230")
+    if v.as_tuple().exponent< -2 and v!=round(v,2):
+        raise ValueError('Amount can only have up to 2 decimal places')
+    if v>=MONEY_LIMIT:
+        raise ValueError('Amount must be less than 100000000')
+    return v
+
+#money is a Decimal matching the NUMERIC(10,2) columns: positive, at most 2 decimal places.
+#checked by hand because pydantic's max_digits/decimal_places constraints cost about 3x more
+Money=Annotated[Decimal,Field(gt=0),AfterValidator(check_money)]
+Category=Annotated[str,Field(min_length=1,max_length=50),AfterValidator(check_category)]
+Description=Annotated[str,Field(min_length=1,max_length=200),AfterValidator(not_blank('Description cannot be empty'))]
+ExpenseDate=Annotated[date,BeforeValidator(parse_expense_date)]
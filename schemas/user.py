@@ -1,25 +1,31 @@
-from pydantic import BaseModel,EmailStr,Field,validator
+import re
+from pydantic import BaseModel,EmailStr,Field,field_validator
+from schemas.fields import not_blank
+
+HAS_DIGIT=re.compile(r'\d')
+HAS_LETTER=re.compile(r'[^\W\d_]') #any unicode letter, like str.isalpha
+
 class UserRegister(BaseModel):  #basemodel is the base class for creating validation models
     name:str =Field(...,min_length=1,max_length=100)
     email:EmailStr #validates the email format automatically
     password:str = Field(...,min_length=8,max_length=100)
 
-    @validator('name')
-    def name_must_not_be_empty(cls,v):
-        if not v.strip():
-            raise ValueError('Name cannot be empty or just spaces')
-        return v.strip() #v.strip() removes spaces from start and end
-    
-    
-    @validator('password')
+    #removing spaces from start and end, name cannot be just spaces
+    _name_not_blank=field_validator('name')(not_blank('Name cannot be empty or just spaces'))
+
+    @field_validator('password')
+    @classmethod
     def password_strength(cls,v):
         #password must have atleast one letter and one number
-        if not any(char.isdigit() for char in v):
+        if not HAS_DIGIT.search(v):
             raise ValueError('Password must contain at least one number')
-        if not any(char.isalpha() for char in v):
+        if not HAS_LETTER.search(v):
             raise ValueError('Password must contain atleast one letter')
         return v
 
 class UserLogin(BaseModel):
     email:EmailStr
     password:str =Field(...,min_length=1)
+
+class RefreshRequest(BaseModel):
+    refresh_token:str =Field(...,min_length=1)
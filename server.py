@@ -0,0 +1,37 @@
+"""
+Production entrypoint: runs main2.create_app() under uvicorn with WEB_WORKERS
+processes (one per core by default), no reloader and access logs on stdout.
+
+Each worker builds its own app, database pool and hashing pool, so the
+database sees up to WEB_WORKERS * DB_POOL_MAX_SIZE connections. On SIGTERM
+or SIGINT the workers stop accepting connections, let in-flight requests
+finish for up to GRACEFUL_TIMEOUT seconds, then close their pools.
+
+usage: python server.py
+       WEB_WORKERS=4 PORT=8080 python server.py
+"""
+import copy
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+import config
+
+def log_config():
+    #uvicorn's logging plus the app's own loggers (startup timing, slow queries) at INFO
+    logging_config=copy.deepcopy(LOGGING_CONFIG)
+    logging_config["root"]={"handlers":["default"],"level":"INFO"}
+    return logging_config
+
+def main():
+    uvicorn.run(
+        "main2:create_app",
+        factory=True,
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WEB_WORKERS,
+        timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT,
+        proxy_headers=True, #client IPs for rate limiting come from X-Forwarded-For behind a trusted proxy
+        log_config=log_config()
+    )
+
+if __name__=="__main__":
+    main()
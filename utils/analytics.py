@@ -0,0 +1,78 @@
+#spending analytics computed with numpy over columnar arrays: no per-row python loops.
+#input is the daily rollup for one user (day, category, total), which is at most
+#days x categories rows however many expenses the user has
+from datetime import date
+import numpy as np
+
+def _month(value) -> int:
+    #months since 1970-01
+    return int(np.datetime64(value,"M").astype(np.int64))
+
+def _offset(window:int) -> int:
+    #months read before the first reported one: enough for a full rolling window
+    #and for the month-over-month change of the first month
+    return max(window-1,1)
+
+def history_start(today:date,months:int,window:int) -> date:
+    #first day the analytics need from the rollup
+    first=_month(today)-months+1-_offset(window)
+    return np.datetime64(first,"M").astype("datetime64[D]").item()
+
+def spending_analytics(days,categories,totals,today:date,months:int=12,window:int=3,top:int=5) -> dict:
+    """
+    days are day numbers since 1970-01-01, categories and totals are parallel to them.
+    returns monthly totals, a trailing rolling average, month-over-month changes and
+    each category's total and share over the last `months` months (current month included)
+    """
+    offset=_offset(window)
+    end=_month(today)
+    first=end-months+1-offset
+    span=end-first+1
+
+    days=np.asarray(days,dtype=np.int64)
+    totals=np.asarray(totals,dtype=np.float64)
+    names,codes=np.unique(np.asarray(categories,dtype=str),return_inverse=True)
+    month=days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)-first
+    keep=(month>=0)&(month<span)
+
+    #months x categories matrix of spend, one bincount instead of a loop
+    grid=np.bincount(
+        month[keep]*len(names)+codes.reshape(-1)[keep],
+        weights=totals[keep],
+        minlength=span*len(names)
+    ).reshape(span,len(names)).astype(np.float64,copy=False) #bincount gives ints when there are no rows
+
+    monthly=grid.sum(axis=1)
+    shown=monthly[offset:]
+    previous=monthly[offset-1:-1]
+    cumulative=np.concatenate(([0.0],np.cumsum(monthly)))
+    rolling=(cumulative[offset+1:]-cumulative[offset+1-window:len(cumulative)-window])/window
+    change=shown-previous
+    change_pct=np.divide(change*100,previous,out=np.full_like(change,np.nan),where=previous!=0)
+
+    by_category=grid[offset:]
+    category_totals=by_category.sum(axis=0)
+    overall=category_totals.sum()
+    shares=category_totals/overall if overall else np.zeros_like(category_totals)
+    order=np.argsort(-category_totals,kind="stable")
+    order=order[category_totals[order]>0]
+
+    breakdown=[
+        {"category":str(names[i]),"total":round(float(category_totals[i]),2),"share":round(float(shares[i]),4)}
+        for i in order
+    ]
+    return{
+        "months":np.arange(end-months+1,end+1).astype("datetime64[M]").astype(str).tolist(),
+        "monthly_totals":np.round(shown,2).tolist(),
+        "rolling_average":np.round(rolling,2).tolist(),
+        "month_over_month":{
+            "change":np.round(change,2).tolist(),
+            "change_pct":[None if np.isnan(v) else round(float(v),2) for v in change_pct]
+        },
+        "total":round(float(overall),2),
+        "categories":breakdown,
+        "top_categories":[
+            {**breakdown[rank],"monthly_totals":np.round(by_category[:,i],2).tolist()}
+            for rank,i in enumerate(order[:top])
+        ]
+    }
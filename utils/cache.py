@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+#in-process LRU cache where every entry also carries its own expiry time (unix seconds).
+#the least recently used entry is dropped once maxsize is reached
+class TTLCache:
+    def __init__(self,maxsize:int,ttl:float|None=None):
+        self.maxsize=maxsize
+        self.ttl=ttl #default lifetime in seconds when set() is not given expires_at
+        self.hits=0
+        self.misses=0
+        self._data=OrderedDict() #key -> (expires_at,value)
+        self._lock=threading.Lock()
+
+    def get(self,key,default=None):
+        with self._lock:
+            entry=self._data.get(key)
+            if entry is not None:
+                expires_at,value=entry
+                if expires_at is None or expires_at>time.time():
+                    self._data.move_to_end(key)
+                    self.hits+=1
+                    return value
+                del self._data[key]
+            self.misses+=1
+            return default
+
+    def set(self,key,value,expires_at:float|None=None):
+        if expires_at is None and self.ttl is not None:
+            expires_at=time.time()+self.ttl
+        with self._lock:
+            self._data[key]=(expires_at,value)
+            self._data.move_to_end(key)
+            while len(self._data)>self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self,key):
+        with self._lock:
+            self._data.pop(key,None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total=self.hits+self.misses
+        return{
+            "size":len(self._data),
+            "maxsize":self.maxsize,
+            "hits":self.hits,
+            "misses":self.misses,
+            "hit_rate":round(self.hits/total,4) if total else 0.0
+        }
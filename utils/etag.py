@@ -0,0 +1,33 @@
+import hashlib
+from datetime import date
+from fastapi import Depends,HTTPException,Request,Response,status
+from routes.auth import get_current_user
+from utils.versions import user_data_state
+
+#conditional GET: the ETag of a response is derived from the user's data version, the
+#path and the query string, so it can be checked before any rows are fetched
+
+def make_etag(user_id:int,version:int,request:Request) -> str:
+    #weak because it follows the data, not the exact bytes. the day is part of it
+    #because the summaries, dashboard and analytics move at midnight
+    raw=f"{user_id}:{version}:{date.today().isoformat()}:{request.url.path}?{request.url.query}"
+    return 'W/"'+hashlib.blake2b(raw.encode(),digest_size=12).hexdigest()+'"'
+
+def etag_matches(if_none_match:str,etag:str) -> bool:
+    if if_none_match.strip()=="*":
+        return True
+    tag=etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/")==tag for candidate in if_none_match.split(","))
+
+async def data_version(request:Request,response:Response,current_user_id:int=Depends(get_current_user)) -> int:
+    #dependency for GET routes that only read the user's own data. answers 304 Not Modified
+    #when If-None-Match already holds the current ETag, otherwise sets the ETag and returns
+    #the version so routes with their own cache don't read it a second time
+    version=(await user_data_state(request,current_user_id))['data_version']
+    etag=make_etag(current_user_id,version,request)
+    headers={"ETag":etag,"Cache-Control":"private, no-cache"} #clients keep the body but always revalidate
+    if_none_match=request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match,etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED,headers=headers)
+    response.headers.update(headers)
+    return version
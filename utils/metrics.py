@@ -0,0 +1,137 @@
+import bisect
+import math
+import time
+
+#in-process counters and histograms rendered in the Prometheus text format on GET /metrics.
+#updates happen on the event loop thread, so plain dict updates are enough (no locks).
+#every worker process keeps its own numbers
+
+LATENCY_BUCKETS=(0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0) #seconds
+
+def _escape(value) -> str:
+    return str(value).replace("\\","\\\\").replace('"','\\"').replace("\n","\\n")
+
+def _labels(names,values) -> str:
+    if not names:
+        return ""
+    return "{"+",".join(f'{name}="{_escape(value)}"' for name,value in zip(names,values))+"}"
+
+class Counter:
+    def __init__(self,name:str,help:str,labels=()):
+        self.name=name
+        self.help=help
+        self.labels=tuple(labels)
+        self._values={} #label values -> count
+
+    def inc(self,*labels,amount:float=1):
+        self._values[labels]=self._values.get(labels,0)+amount
+
+    def value(self,*labels):
+        return self._values.get(labels,0)
+
+    def render(self):
+        lines=[f"# HELP {self.name} {self.help}",f"# TYPE {self.name} counter"]
+        lines+=[f"{self.name}{_labels(self.labels,key)} {value}" for key,value in self._values.items()]
+        return lines
+
+class Gauge(Counter):
+    def dec(self,*labels,amount:float=1):
+        self.inc(*labels,amount=-amount)
+
+    def set(self,*labels,value:float):
+        self._values[labels]=value
+
+    def render(self):
+        lines=super().render()
+        lines[1]=f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self,name:str,help:str,labels=(),buckets=LATENCY_BUCKETS):
+        self.name=name
+        self.help=help
+        self.labels=tuple(labels)
+        self.buckets=tuple(buckets)
+        self._values={} #label values -> [count per bucket (+Inf last), sum]
+
+    def observe(self,*labels,value:float):
+        entry=self._values.get(labels)
+        if entry is None:
+            entry=self._values[labels]=[[0]*(len(self.buckets)+1),0.0]
+        #one bisect and one increment per observation, the cumulative counts are built when rendering
+        entry[0][bisect.bisect_left(self.buckets,value)]+=1
+        entry[1]+=value
+
+    def count(self,*labels):
+        entry=self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def total_count(self):
+        #observations across every label combination
+        return sum(sum(counts) for counts,_ in self._values.values())
+
+    def render(self):
+        lines=[f"# HELP {self.name} {self.help}",f"# TYPE {self.name} histogram"]
+        for key,(counts,total) in self._values.items():
+            cumulative=0
+            for bound,count in zip((*self.buckets,math.inf),counts):
+                cumulative+=count
+                le="+Inf" if bound==math.inf else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels((*self.labels,'le'),(*key,le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels,key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels,key)} {cumulative}")
+        return lines
+
+
+REQUESTS=Counter("http_requests_total","HTTP requests by route and status code",("method","route","status"))
+REQUEST_DURATION=Histogram("http_request_duration_seconds","HTTP request latency by route",("method","route"))
+IN_FLIGHT=Gauge("http_requests_in_flight","HTTP requests being handled right now")
+QUERY_DURATION=Histogram("db_query_duration_seconds","Database statement latency by operation",("operation",))
+SLOW_QUERIES=Counter("db_slow_queries_total","Statements slower than SLOW_QUERY_MS",("operation",))
+READS=Counter("db_reads_total","Read-only requests by the server they read from",("target",))
+REJECTED=Counter("http_requests_rejected_total","Requests turned away with 429 by route class and reason",("route_class","reason"))
+
+METRICS=[REQUESTS,REQUEST_DURATION,IN_FLIGHT,QUERY_DURATION,SLOW_QUERIES,READS,REJECTED]
+
+def render(gauges:dict|None=None) -> str:
+    #gauges: {name: value} or {name: {label value: value}} read at scrape time (connection pool, caches)
+    lines=[]
+    for metric in METRICS:
+        lines+=metric.render()
+    for name,value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        if isinstance(value,dict):
+            lines+=[f'{name}{{name="{_escape(label)}"}} {v}' for label,v in value.items()]
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines)+"\n"
+
+
+#ASGI middleware (not BaseHTTPMiddleware) so streaming responses are not buffered
+#and the per-request cost stays at a couple of dict updates
+class MetricsMiddleware:
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            return await self.app(scope,receive,send)
+
+        status_code=500 #stays 500 if the app fails before starting a response
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"]=="http.response.start":
+                status_code=message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started=time.perf_counter()
+        try:
+            await self.app(scope,receive,send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            #the route template (/expenses/{expenses_id}) keeps the label count bounded, FastAPI puts it in the scope
+            route=scope.get("route")
+            path=getattr(route,"path_format","unmatched")
+            REQUESTS.inc(scope["method"],path,status_code)
+            REQUEST_DURATION.observe(scope["method"],path,value=time.perf_counter()-started)
@@ -0,0 +1,32 @@
+import base64
+import json
+from fastapi import HTTPException,status
+
+#a cursor is the sort key of the last row on a page, base64 encoded so clients treat it as opaque
+def encode_cursor(*values):
+    raw=json.dumps(values,default=str,separators=(",",":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor:str,*types):
+    #turning a cursor back into typed values, e.g. decode_cursor(c,date.fromisoformat,int)
+    try:
+        raw=base64.urlsafe_b64decode(cursor+"="*(-len(cursor)%4))
+        values=json.loads(raw)
+        if not isinstance(values,list) or len(values)!=len(types):
+            raise ValueError("wrong number of values")
+        return [convert(value) for convert,value in zip(types,values)]
+    except (ValueError,TypeError,ArithmeticError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
+
+def parse_fields(fields:str|None,allowed:tuple) -> list:
+    #fields="amount,category" -> ["amount","category"], no fields means every column
+    if not fields:
+        return list(allowed)
+    requested=list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown=[f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return requested
@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt #password hasher
+from fastapi import HTTPException,status
+from fastapi.concurrency import run_in_threadpool
+import config
+
+#settingup password hashing
+def hash_password(password:str,rounds:int=config.BCRYPT_ROUNDS) -> str: #-> str means that the  function returns a string
+    pwd_bytes=password.encode('utf-8') #converts the password string into bytes. utf-8 is the encoding format standard for text
+    salt=bcrypt.gensalt(rounds=rounds) #salt is a random data added to the password before hashing and it makes each hash unique,even on the same password. rounds is the cost (2^rounds iterations)
+    return bcrypt.hashpw(pwd_bytes,salt).decode('utf-8') #bcrypt.hashpw(pwd_bytes, salt) - Hashes the password with the salt..decode('utf-8') - Converts bytes back to a string..return - Returns the hashed password string
+
+
+#verifying the password
+def verify_password(plain_password:str,hashed_password:str) -> bool:
+    #checking if a plain password matches the hashed version
+    pwd_bytes=plain_password.encode('utf-8')
+    hashed_bytes=hashed_password.encode('utf-8')
+    return bcrypt.checkpw(pwd_bytes,hashed_bytes)
+
+#a bcrypt hash looks like $2b$12$..., the 12 is the cost it was made with
+def needs_rehash(hashed_password:str) -> bool:
+    try:
+        return int(hashed_password.split("$")[2])!=config.BCRYPT_ROUNDS
+    except (IndexError,ValueError):
+        return True
+
+
+#bcrypt is cpu bound, so it runs in its own processes instead of the request threads.
+#_pending counts hashes queued or running; past HASH_QUEUE_SIZE new ones are turned away
+_executor=None
+_pending=0
+
+def _warm_up():
+    return True
+
+def start_hashing_pool():
+    global _executor
+    if _executor is None:
+        #spawn instead of fork, forking a process that already runs an event loop and threads is unsafe
+        _executor=ProcessPoolExecutor(max_workers=config.HASH_WORKERS,mp_context=multiprocessing.get_context("spawn"))
+        for _ in range(config.HASH_WORKERS):
+            _executor.submit(_warm_up)
+    return _executor
+
+def stop_hashing_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True,cancel_futures=True)
+    _executor=None
+
+async def _run(func,*args):
+    global _pending
+    if _executor is None:
+        #pool not started (scripts, tests): fall back to a thread
+        return await run_in_threadpool(func,*args)
+    if _pending>=config.HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After":"1"}
+        )
+    _pending+=1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor,func,*args)
+    finally:
+        _pending-=1
+
+async def hash_password_async(password:str) -> str:
+    return await _run(hash_password,password,config.BCRYPT_ROUNDS)
+
+async def verify_password_async(plain_password:str,hashed_password:str) -> bool:
+    return await _run(verify_password,plain_password,hashed_password)
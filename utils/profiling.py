@@ -0,0 +1,81 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+import config
+from database.connection import query_log
+
+#opt-in profiling of a single request. a request that sends the X-Profile header with
+#PROFILE_TOKEN runs under cProfile and has its SQL statements recorded. the results go to
+#PROFILE_DIR as <id>.prof (pstats, open with snakeviz or python -m pstats) and
+#<id>.txt (top functions plus every statement with its time). the id comes back in X-Profile-Id.
+#main2.py only adds this middleware when PROFILE_TOKEN is set, so other requests pay nothing.
+#cProfile sees the whole event loop thread, so requests running at the same time show up too.
+#only one profile runs at a time per worker: a second cProfile enabled on the same thread takes
+#over from the first, which then reports nothing. while one runs, other X-Profile requests are
+#served normally and come back without X-Profile-Id
+
+PROFILE_HEADER=b"x-profile"
+#set while a profile is running in this worker. everything runs on the event loop thread
+#and there is no await between the check and the set, so a plain flag is enough
+_profiling=False
+
+def _wants_profile(scope) -> bool:
+    for name,value in scope["headers"]:
+        if name==PROFILE_HEADER:
+            return hmac.compare_digest(value,config.PROFILE_TOKEN.encode())
+    return False
+
+def _write_report(profile_id:str,scope,profiler,statements,elapsed:float):
+    os.makedirs(config.PROFILE_DIR,exist_ok=True)
+    base=os.path.join(config.PROFILE_DIR,profile_id)
+    profiler.dump_stats(base+".prof")
+
+    functions=io.StringIO()
+    pstats.Stats(profiler,stream=functions).sort_stats("cumulative").print_stats(40)
+    sql_ms=sum(s['ms'] for s in statements)
+    with open(base+".txt","w") as f:
+        f.write(f"{scope['method']} {scope['path']}?{scope['query_string'].decode()}\n")
+        f.write(f"total {elapsed*1000:.1f} ms, {len(statements)} statements, {sql_ms:.1f} ms in SQL\n\n")
+        f.write("SQL (ms, statement, parameter shape)\n")
+        for s in statements:
+            f.write(f"{s['ms']:10.3f}  {s['statement']}  | {s['params']}\n")
+        f.write("\nfunctions by cumulative time\n")
+        f.write(functions.getvalue())
+    with open(base+".sql.json","w") as f:
+        json.dump(statements,f,indent=2)
+
+class ProfilerMiddleware:
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        global _profiling
+        if scope["type"]!="http" or _profiling or not _wants_profile(scope):
+            return await self.app(scope,receive,send)
+
+        profile_id=time.strftime("%Y%m%d-%H%M%S")+"-"+uuid.uuid4().hex[:8]
+        async def send_with_id(message):
+            if message["type"]=="http.response.start":
+                message["headers"]=[*message.get("headers",[]),(b"x-profile-id",profile_id.encode())]
+            await send(message)
+
+        statements=[]
+        token=query_log.set(statements)
+        profiler=cProfile.Profile()
+        started=time.perf_counter()
+        profiler.enable()
+        _profiling=True
+        try:
+            await self.app(scope,receive,send_with_id)
+        finally:
+            profiler.disable()
+            query_log.reset(token)
+            try:
+                _write_report(profile_id,scope,profiler,statements,time.perf_counter()-started)
+            finally:
+                _profiling=False
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+import config
+from routes.auth import decode_access_token
+from utils.metrics import REJECTED
+
+#per-user and per-IP token buckets for each route class, plus a cap on requests using the
+#database at once. everything lives in this process and runs on the event loop thread,
+#so there are no locks and every check is a couple of dict operations
+
+#paths that never touch the database are not limited
+EXEMPT_PATHS=frozenset(["/","/health","/metrics","/docs","/redoc","/openapi.json","/docs/oauth2-redirect"])
+
+def route_class(method:str,path:str) -> str|None:
+    if path in EXEMPT_PATHS:
+        return None
+    if path.startswith("/auth/") and path!="/auth/me":
+        return "auth"
+    if path.rstrip("/")=="/expenses/export":
+        return "exports"
+    if method in ("GET","HEAD"):
+        return "reads"
+    return "writes"
+
+class TokenBuckets:
+    def __init__(self,maxsize:int):
+        self.maxsize=maxsize
+        self._buckets=OrderedDict() #key -> [tokens,last refill (monotonic seconds)]
+
+    def take(self,key,rate:float,burst:float) -> float:
+        #takes one token, returns 0 on success or the seconds until a token is available
+        now=time.monotonic()
+        bucket=self._buckets.get(key)
+        if bucket is None:
+            bucket=self._buckets[key]=[burst,now]
+            if len(self._buckets)>self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0]=min(burst,bucket[0]+(now-bucket[1])*rate)
+            bucket[1]=now
+        if bucket[0]>=1:
+            bucket[0]-=1
+            return 0.0
+        return (1-bucket[0])/rate if rate>0 else 60.0
+
+    def __len__(self):
+        return len(self._buckets)
+
+class AdmissionGate:
+    #at most `limit` requests run at once, up to `queue` more wait `timeout` seconds for a slot
+    def __init__(self,limit:int,queue:int,timeout:float):
+        self.limit=limit
+        self.queue=queue
+        self.timeout=timeout
+        self.waiting=0
+        self._slots=asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if not self._slots.locked():
+            await self._slots.acquire() #a slot is free, returns without waiting
+            return True
+        if self.waiting>=self.queue:
+            return False
+        self.waiting+=1
+        try:
+            await asyncio.wait_for(self._slots.acquire(),self.timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            self.waiting-=1
+
+    def release(self):
+        self._slots.release()
+
+    @property
+    def active(self) -> int:
+        return self.limit-self._slots._value
+
+def _user_id(scope):
+    #the access token's user, decode_access_token answers from the token cache after the first request
+    for name,value in scope["headers"]:
+        if name==b"authorization":
+            scheme,_,token=value.decode("latin-1").partition(" ")
+            if scheme.lower()!="bearer" or not token:
+                return None
+            try:
+                return decode_access_token(token)
+            except HTTPException:
+                return None #the route answers 401 itself, until then the request counts against its IP
+    return None
+
+def _too_many(retry_after:float,detail:str):
+    return ORJSONResponse({"detail":detail},status_code=429,headers={"Retry-After":str(max(1,math.ceil(retry_after)))})
+
+buckets=TokenBuckets(config.RATE_LIMIT_MAX_KEYS)
+admission=AdmissionGate(config.DB_ADMISSION_LIMIT,config.DB_ADMISSION_QUEUE,config.DB_ADMISSION_TIMEOUT) if config.DB_ADMISSION_LIMIT>0 else None
+
+def _check_buckets(scope,kind:str) -> float:
+    rate,burst=config.RATE_LIMITS[kind]
+    client=scope.get("client")
+    ip=client[0] if client else "unknown"
+    if kind=="auth":
+        return buckets.take(("ip",kind,ip),rate,burst)
+    factor=config.RATE_LIMIT_IP_MULTIPLIER
+    wait=buckets.take(("ip",kind,ip),rate*factor,burst*factor)
+    user_id=_user_id(scope)
+    if user_id is not None:
+        wait=max(wait,buckets.take(("user",kind,user_id),rate,burst))
+    return wait
+
+def stats():
+    return{
+        "buckets":len(buckets),
+        "db_active":admission.active if admission else None,
+        "db_waiting":admission.waiting if admission else None
+    }
+
+#ASGI middleware like MetricsMiddleware, a rejected request never reaches routing or the pool
+class RateLimitMiddleware:
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            return await self.app(scope,receive,send)
+        kind=route_class(scope["method"],scope["path"])
+        if kind is None:
+            return await self.app(scope,receive,send)
+
+        if config.RATE_LIMIT_ENABLED:
+            wait=_check_buckets(scope,kind)
+            if wait:
+                REJECTED.inc(kind,"rate_limit")
+                return await _too_many(wait,"Too many requests, slow down")(scope,receive,send)
+
+        if admission is None:
+            return await self.app(scope,receive,send)
+        if not await admission.acquire():
+            REJECTED.inc(kind,"db_busy")
+            return await _too_many(1,"Server is busy, try again")(scope,receive,send)
+        try:
+            await self.app(scope,receive,send)
+        finally:
+            admission.release()
@@ -0,0 +1,39 @@
+from fastapi import Depends,Request
+import config
+from database.connection import has_replicas,pooled_connection,read_connection
+from database.statements import execute
+from routes.auth import get_current_user
+
+#per-user data version (users.data_version), bumped inside the transaction of every expense
+#or budget write. caches and ETags are built from the version they saw, so a bump makes all of
+#them stale without having to find and delete anything. it lives in the database so every
+#worker process sees the same number and it survives restarts
+
+async def bump_user_version(conn,user_id:int) -> int:
+    #call before the commit of the write it belongs to
+    cur=await execute(conn,"user_version_bump",(user_id,))
+    row=await cur.fetchone()
+    return row['data_version'] if row else 0
+
+async def user_data_state(request:Request,user_id:int) -> dict:
+    #the version plus whether the user wrote within READ_YOUR_WRITES_SECONDS, read from the
+    #primary once per request and shared by the ETag check and the replica routing. the primary
+    #connection goes back to the pool right away instead of staying checked out for the request
+    state=getattr(request.state,"user_data",None)
+    if state is None:
+        async with pooled_connection() as conn:
+            cur=await execute(conn,"user_data_state",(config.READ_YOUR_WRITES_SECONDS,user_id))
+            state=request.state.user_data=await cur.fetchone() or {"data_version":0,"recent_write":False}
+    return state
+
+#FastAPI dependency for GET handlers that only read: a replica connection when DB_REPLICA_URLS is
+#set, a primary connection when there are no healthy replicas or the user wrote something a
+#moment ago. a replica-served request holds no primary connection while it runs
+async def get_read_db(request:Request,current_user_id:int=Depends(get_current_user)):
+    if not has_replicas():
+        async with pooled_connection() as conn:
+            yield conn
+        return
+    state=await user_data_state(request,current_user_id)
+    async with read_connection(use_primary=state['recent_write']) as conn:
+        yield conn